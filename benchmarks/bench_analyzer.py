@@ -0,0 +1,175 @@
+"""
+Micro-benchmark for CodeAnalyzer on large files.
+
+Generates large modules (many classes and functions, a long flat dict
+literal, and a deeply nested expression as generated code produces) and
+times the original recursive ast.NodeVisitor analyzer against the iterative
+CodeAnalyzer in deadcode.py on the same parsed trees. Both must produce the
+same definitions, imports, usages, __main__ blocks and exports; the
+recursive analyzer is reported as failing where it hits the recursion limit.
+
+    python3 benchmarks/bench_analyzer.py --functions 5000 --depth 2000 --repeat 5
+"""
+
+import argparse
+import ast
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import deadcode
+
+
+class LegacyAnalyzer(ast.NodeVisitor):
+    """CodeAnalyzer as it was before the iterative walker"""
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.definitions = []
+        self.usages = []
+        self.imports = []
+        self.main_blocks = []
+        self.exports = []
+        self.current_class = None
+
+    def visit_FunctionDef(self, node):
+        func_name = node.name
+        if self.current_class:
+            func_name = f"{self.current_class}.{func_name}"
+        self.definitions.append(deadcode.CodeElement(
+            func_name, 'function', self.file_path, node.lineno, end_line_number=node.end_lineno))
+        self.generic_visit(node)
+
+    def visit_AsyncFunctionDef(self, node):
+        self.visit_FunctionDef(node)
+
+    def visit_ClassDef(self, node):
+        self.definitions.append(deadcode.CodeElement(
+            node.name, 'class', self.file_path, node.lineno, end_line_number=node.end_lineno))
+        old_class = self.current_class
+        self.current_class = node.name
+        self.generic_visit(node)
+        self.current_class = old_class
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            self.imports.append(deadcode.CodeElement(alias.name, 'import', self.file_path,
+                                                     node.lineno))
+
+    def visit_ImportFrom(self, node):
+        module = node.module or ''
+        for alias in node.names:
+            import_name = f"{module}.{alias.name}" if module else alias.name
+            self.imports.append(deadcode.CodeElement(import_name, 'import', self.file_path,
+                                                     node.lineno))
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Load):
+            self.usages.append((node.id, node.lineno))
+        self.generic_visit(node)
+
+    def visit_Attribute(self, node):
+        if isinstance(node.ctx, ast.Load):
+            if isinstance(node.value, ast.Name):
+                self.usages.append((f"{node.value.id}.{node.attr}", node.lineno))
+        self.generic_visit(node)
+
+    def visit_If(self, node):
+        test = node.test
+        if (isinstance(test, ast.Compare) and len(test.ops) == 1
+                and isinstance(test.ops[0], ast.Eq)):
+            operands = [test.left, test.comparators[0]]
+            if (any(isinstance(op, ast.Name) and op.id == '__name__' for op in operands)
+                    and any(isinstance(op, ast.Constant) and op.value == '__main__'
+                            for op in operands)):
+                self.main_blocks.append((node.body[0].lineno, node.body[-1].end_lineno))
+        self.generic_visit(node)
+
+    def visit_Assign(self, node):
+        if any(isinstance(target, ast.Name) and target.id == '__all__' for target in node.targets):
+            self._record_exports(node.value)
+        self.generic_visit(node)
+
+    def visit_AugAssign(self, node):
+        if isinstance(node.target, ast.Name) and node.target.id == '__all__':
+            self._record_exports(node.value)
+        self.generic_visit(node)
+
+    def _record_exports(self, value):
+        if isinstance(value, (ast.List, ast.Tuple)):
+            for item in value.elts:
+                if isinstance(item, ast.Constant) and isinstance(item.value, str):
+                    self.exports.append(item.value)
+
+
+def large_module(functions):
+    """Classes, methods and functions calling each other, plus a flat dict literal"""
+    lines = ["import os\nfrom collections import OrderedDict, defaultdict\n\n",
+             "__all__ = ['Service_0', 'helper_0']\n\n"]
+    for i in range(functions):
+        if i % 10 == 0:
+            lines.append(f"class Service_{i}(object):\n")
+            lines.append(f"    registry = defaultdict(list)\n\n")
+        lines.append(f"    def method_{i}(self, value):\n")
+        lines.append(f"        result = helper_{max(0, i - 1)}(value) + self.method_{i}.__name__\n")
+        lines.append(f"        return os.path.join(str(result), OrderedDict().get('{i}'))\n\n")
+    for i in range(functions // 10):
+        lines.append(f"async def helper_{i}(value):\n    return [v for v in value if v]\n\n")
+    lines.append("TABLE = {\n")
+    lines.extend(f"    'key_{i}': (helper_{i % 10}, {i}),\n" for i in range(functions))
+    lines.append("}\n\nif __name__ == '__main__':\n    helper_0(TABLE)\n")
+    return ''.join(lines)
+
+
+def nested_module(depth):
+    """One expression nested ``depth`` levels deep, as long generated expressions are"""
+    return "value = " + " + ".join(f"name_{i % 7}" for i in range(depth)) + "\n"
+
+
+def analyze(analyzer_class, tree):
+    analyzer = analyzer_class('bench.py')
+    analyzer.visit(tree)
+    return (analyzer.definitions, analyzer.imports, analyzer.usages,
+            analyzer.main_blocks, analyzer.exports)
+
+
+def best_time(analyzer_class, tree, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        analyze(analyzer_class, tree)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the recursive and iterative analyzers')
+    parser.add_argument('--functions', type=int, default=5000, help='Functions in the large module')
+    parser.add_argument('--depth', type=int, default=2000, help='Nesting of the deep expression')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per analyzer; best is kept')
+    args = parser.parse_args()
+
+    cases = [('large module', large_module(args.functions)),
+             ('nested expression', nested_module(args.depth))]
+    print(f"{'case':<20}{'nodes':>10}{'recursive ms':>15}{'iterative ms':>15}{'speedup':>10}")
+    for label, source in cases:
+        tree = ast.parse(source)
+        nodes = sum(1 for _ in ast.walk(tree))
+        iterative = best_time(deadcode.CodeAnalyzer, tree, args.repeat)
+        try:
+            expected = analyze(LegacyAnalyzer, tree)
+        except RecursionError:
+            print(f"{label:<20}{nodes:>10}{'RecursionError':>15}{iterative * 1000:>15.1f}{'-':>10}")
+            continue
+        if analyze(deadcode.CodeAnalyzer, tree) != expected:
+            sys.exit(f"{label}: iterative analyzer output differs from the recursive one")
+        recursive = best_time(LegacyAnalyzer, tree, args.repeat)
+        print(f"{label:<20}{nodes:>10}{recursive * 1000:>15.1f}{iterative * 1000:>15.1f}"
+              f"{recursive / iterative:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
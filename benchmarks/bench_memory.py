@@ -0,0 +1,109 @@
+"""
+Memory benchmark for the detector's in-memory representation.
+
+Builds the same synthetic set of elements and usages twice: once with the
+original layout (dataclass elements holding the full path and a "path:line"
+string set, usages as (name, path, line) tuples) and once with the compact
+layout used by deadcode.py, and reports the traced allocation of each.
+
+    python3 benchmarks/bench_memory.py --files 2000 --elements 40 --usages 6
+"""
+
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from array import array
+from dataclasses import dataclass
+from typing import Set
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import deadcode
+
+
+@dataclass
+class LegacyCodeElement:
+    name: str
+    type: str
+    file_path: str
+    line_number: int
+    is_used: bool = False
+    used_by: Set[str] = None
+    end_line_number: int = None
+
+    def __post_init__(self):
+        if self.used_by is None:
+            self.used_by = set()
+
+
+def workload(files, elements, usages):
+    """Yield (file_path, element_name, line, usage_lines) in a reproducible layout"""
+    for f in range(files):
+        # Paths are built per file, as os.walk/os.path.join would
+        file_path = os.path.join('project', f'package_{f % 50}', f'module_{f}.py')
+        for e in range(elements):
+            yield file_path, f'function_{e}', e * 10 + 1, range(e * 10 + 2, e * 10 + 2 + usages)
+
+
+def build_legacy(files, elements, usages):
+    code_elements = {}
+    pending = []
+    for file_path, name, line, usage_lines in workload(files, elements, usages):
+        element = LegacyCodeElement(name, 'function', file_path, line, end_line_number=line + 9)
+        code_elements[f"{file_path}::{name}"] = element
+        for usage_line in usage_lines:
+            pending.append((name, file_path, usage_line))
+            element.is_used = True
+            element.used_by.add(f"{file_path}:{usage_line}")
+    return code_elements, pending
+
+
+def build_compact(files, elements, usages):
+    code_elements = {}
+    names, file_ids, lines = [], array('l'), array('l')
+    for file_path, name, line, usage_lines in workload(files, elements, usages):
+        element = deadcode.CodeElement(name, 'function', file_path, line, end_line_number=line + 9)
+        code_elements[element.key] = element
+        for usage_line in usage_lines:
+            names.append(sys.intern(name))
+            file_ids.append(element.file_id)
+            lines.append(usage_line)
+            element.is_used = True
+            element.add_usage(element.file_id, usage_line)
+    return code_elements, (names, file_ids, lines)
+
+
+def measure(builder, *args):
+    gc.collect()
+    tracemalloc.start()
+    result = builder(*args)
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return current, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare legacy and compact element memory use')
+    parser.add_argument('--files', type=int, default=1000)
+    parser.add_argument('--elements', type=int, default=40, help='Elements per file')
+    parser.add_argument('--usages', type=int, default=5, help='Usages per element')
+    args = parser.parse_args()
+
+    shape = (args.files, args.elements, args.usages)
+    legacy_current, legacy_peak = measure(build_legacy, *shape)
+    compact_current, compact_peak = measure(build_compact, *shape)
+
+    total = args.files * args.elements
+    print(f"{total} elements, {total * args.usages} usages")
+    print(f"{'layout':<10}{'retained MB':>14}{'peak MB':>12}{'bytes/element':>16}")
+    for label, current, peak in (('legacy', legacy_current, legacy_peak),
+                                 ('compact', compact_current, compact_peak)):
+        print(f"{label:<10}{current / 2**20:>14.1f}{peak / 2**20:>12.1f}{current / total:>16.0f}")
+    print(f"reduction: {(1 - compact_current / legacy_current) * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
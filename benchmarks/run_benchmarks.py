@@ -0,0 +1,188 @@
+"""
+Phase-by-phase benchmark of deadcode.py on a synthetic project.
+
+Generates a project with benchmarks/synthetic.py, runs every phase of
+run_analysis separately and records the best wall time of --repeat runs:
+
+    walk                        find_python_files
+    parse                       parse_file (ast.parse + CodeAnalyzer) per file
+    mark_as_used                merge into the symbol table + resolve_usages
+    create_graph_nodes
+    create_usage_relationships
+    find_dead_code
+
+Graph phases run against the in-process backend by default, or against a
+Neo4j instance (e.g. the docker-compose container) with --backend neo4j.
+Results are written as JSON; with --baseline, phases slower than the
+baseline by more than --threshold are reported and the exit code is 1.
+
+    python3 benchmarks/run_benchmarks.py --files 2000 --output results.json
+    python3 benchmarks/run_benchmarks.py --files 2000 --baseline results.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import deadcode
+from synthetic import add_shape_arguments, generate_project, shape_from_args
+
+PHASES = ('walk', 'parse', 'mark_as_used', 'create_graph_nodes',
+          'create_usage_relationships', 'find_dead_code')
+
+# Differences below this many seconds are treated as noise when comparing
+MIN_REGRESSION_SECONDS = 0.005
+
+
+@contextmanager
+def timed(timings, phase):
+    start = time.perf_counter()
+    yield
+    timings[phase] = time.perf_counter() - start
+
+
+def make_detector(args):
+    if args.backend == 'neo4j':
+        return deadcode.Neo4jDeadCodeDetector(args.neo4j_uri, args.neo4j_user, args.neo4j_password,
+                                              batch_size=args.batch_size, project='benchmark')
+    return deadcode.DeadCodeDetector(deadcode.InMemoryBackend(), batch_size=args.batch_size)
+
+
+def run_once(project_root, args):
+    timings = {}
+    detector = make_detector(args)
+    try:
+        with timed(timings, 'walk'):
+            python_files = deadcode.find_python_files(project_root)
+
+        with timed(timings, 'parse'):
+            analyses = [deadcode.parse_file(file_path) for file_path in python_files]
+
+        with timed(timings, 'mark_as_used'):
+            for analysis in analyses:
+                if analysis is not None:
+                    detector.merge_analysis(analysis)
+            detector.resolve_usages()
+
+        detector.clear_database()
+        detector.create_schema()
+        with timed(timings, 'create_graph_nodes'):
+            detector.create_graph_nodes()
+
+        edges = list(detector.usage_edges())
+        with timed(timings, 'create_usage_relationships'):
+            detector.create_usage_relationships(edges)
+
+        with timed(timings, 'find_dead_code'):
+            dead_code = detector.find_dead_code()
+
+        if args.backend == 'neo4j':
+            detector.clear_database()
+    finally:
+        detector.close()
+
+    counts = {
+        'files': len(python_files),
+        'elements': len(detector.code_elements),
+        'edges': len(edges),
+        'dead_code': len(dead_code),
+    }
+    return timings, counts
+
+
+def compare(phases, baseline_phases, threshold):
+    """Phases slower than baseline * (1 + threshold), beyond timer noise"""
+    regressions = {}
+    for phase, seconds in phases.items():
+        previous = baseline_phases.get(phase)
+        if previous is None:
+            continue
+        if seconds > previous * (1 + threshold) and seconds - previous > MIN_REGRESSION_SECONDS:
+            regressions[phase] = {'baseline': previous, 'current': seconds,
+                                  'ratio': seconds / previous if previous else float('inf')}
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark each run_analysis phase')
+    add_shape_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per phase; the best is kept')
+    parser.add_argument('--backend', choices=['memory', 'neo4j'], default='memory')
+    parser.add_argument('--neo4j-uri', default='bolt://localhost:7687')
+    parser.add_argument('--neo4j-user', default='neo4j')
+    parser.add_argument('--neo4j-password', default='password')
+    parser.add_argument('--batch-size', type=int, default=deadcode.DEFAULT_BATCH_SIZE)
+    parser.add_argument('--project-dir', help='Reuse or create the synthetic project here '
+                                              'instead of a temporary directory')
+    parser.add_argument('--output', help='Write results JSON to this file')
+    parser.add_argument('--baseline', help='Results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed slowdown relative to the baseline (default: 0.2 = 20%%)')
+    args = parser.parse_args()
+
+    logging.getLogger().setLevel(logging.WARNING)
+    shape = shape_from_args(args)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        project_root = args.project_dir or tmp
+        if not deadcode.find_python_files(project_root):
+            generate_project(project_root, shape)
+
+        best = {}
+        counts = {}
+        for _ in range(args.repeat):
+            timings, counts = run_once(project_root, args)
+            for phase, seconds in timings.items():
+                best[phase] = min(seconds, best.get(phase, seconds))
+
+    results = {
+        'shape': shape._asdict(),
+        'backend': args.backend,
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+        },
+        'counts': counts,
+        'phases': {phase: best[phase] for phase in PHASES},
+    }
+
+    print(f"{counts['files']} files, {counts['elements']} elements, {counts['edges']} edges, "
+          f"{counts['dead_code']} dead ({args.backend} backend, best of {args.repeat})")
+    for phase in PHASES:
+        print(f"  {phase:<28}{best[phase] * 1000:>10.1f} ms")
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get('shape') != results['shape']:
+            print("warning: baseline was recorded for a different project shape")
+        regressions = compare(results['phases'], baseline.get('phases', {}), args.threshold)
+        results['regressions'] = regressions
+        for phase, data in regressions.items():
+            print(f"REGRESSION {phase}: {data['baseline'] * 1000:.1f} ms -> "
+                  f"{data['current'] * 1000:.1f} ms ({data['ratio']:.2f}x)")
+        if regressions:
+            status = 1
+        else:
+            print(f"No phase regressed by more than {args.threshold:.0%}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to: {args.output}")
+
+    sys.exit(status)
+
+
+if __name__ == '__main__':
+    main()
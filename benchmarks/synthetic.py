@@ -0,0 +1,126 @@
+"""
+Synthetic Python project generator for benchmarking deadcode.py.
+
+Projects are laid out as packages of modules. Every module defines classes
+with methods plus top-level functions, imports a few names from other
+modules and calls them from function bodies. The layout is fully
+determined by the arguments and the seed, so runs are comparable.
+
+    python3 benchmarks/synthetic.py /tmp/synthetic --files 2000 --density 3
+"""
+
+import argparse
+import os
+import random
+from typing import NamedTuple
+
+
+class ProjectShape(NamedTuple):
+    files: int = 200
+    classes: int = 3          # classes per module
+    methods: int = 5          # methods per class
+    functions: int = 5        # top-level functions per module
+    density: int = 2          # cross-module references per function/method body
+    modules_per_package: int = 50
+    seed: int = 0
+
+
+def module_name(index: int, shape: ProjectShape) -> str:
+    return f"pkg_{index // shape.modules_per_package}.mod_{index}"
+
+
+def render_module(index: int, shape: ProjectShape, rng: random.Random) -> str:
+    # Names this module pulls in from other modules
+    imported = []
+    others = min(shape.files - 1, max(1, shape.density))
+    for other in rng.sample(range(shape.files - 1), others):
+        other += other >= index  # skip this module
+        names = [f"func_{other}_{rng.randrange(max(1, shape.functions))}"]
+        if shape.classes:
+            names.append(f"Class_{other}_{rng.randrange(shape.classes)}")
+        imported.extend(names)
+        yield f"from {module_name(other, shape)} import {', '.join(names)}\n"
+    yield "\n\n"
+
+    def body(indent: str):
+        references = rng.sample(imported, min(len(imported), shape.density)) if imported else []
+        lines = [f"{indent}result = []\n"]
+        for name in references:
+            if name.startswith('Class_'):
+                lines.append(f"{indent}result.append({name}())\n")
+            else:
+                lines.append(f"{indent}result.append({name}(len(result)))\n")
+        local = rng.randrange(max(1, shape.functions))
+        lines.append(f"{indent}result.append(func_{index}_{local}(len(result)))\n")
+        lines.append(f"{indent}return result\n")
+        return ''.join(lines)
+
+    for f in range(shape.functions):
+        yield f"def func_{index}_{f}(value=0):\n"
+        yield f"    if value > 3:\n        return value\n"
+        yield body("    ")
+        yield "\n\n"
+
+    for c in range(shape.classes):
+        yield f"class Class_{index}_{c}:\n"
+        yield f"    def __init__(self):\n        self.items = []\n\n"
+        for m in range(shape.methods):
+            yield f"    def method_{m}(self, value=0):\n"
+            if m:
+                yield f"        self.method_{rng.randrange(m)}(value)\n"
+            yield body("        ")
+            yield "\n"
+        yield "\n"
+
+
+def generate_project(root: str, shape: ProjectShape) -> int:
+    """Write the project under root and return the number of modules written"""
+    rng = random.Random(shape.seed)
+    packages = set()
+    for index in range(shape.files):
+        package, module = module_name(index, shape).split('.')
+        package_dir = os.path.join(root, package)
+        if package not in packages:
+            os.makedirs(package_dir, exist_ok=True)
+            with open(os.path.join(package_dir, '__init__.py'), 'w') as f:
+                f.write('')
+            packages.add(package)
+        with open(os.path.join(package_dir, f"{module}.py"), 'w') as f:
+            f.writelines(render_module(index, shape, rng))
+
+    with open(os.path.join(root, 'main.py'), 'w') as f:
+        f.write(f"from {module_name(0, shape)} import func_0_0\n\n\n")
+        f.write("def main():\n    return func_0_0()\n\n\n")
+        f.write("if __name__ == '__main__':\n    main()\n")
+    return shape.files
+
+
+def add_shape_arguments(parser: argparse.ArgumentParser) -> None:
+    defaults = ProjectShape()
+    parser.add_argument('--files', type=int, default=defaults.files, help='Modules to generate')
+    parser.add_argument('--classes', type=int, default=defaults.classes, help='Classes per module')
+    parser.add_argument('--methods', type=int, default=defaults.methods, help='Methods per class')
+    parser.add_argument('--functions', type=int, default=defaults.functions,
+                        help='Top-level functions per module')
+    parser.add_argument('--density', type=int, default=defaults.density,
+                        help='Cross-module references per function body')
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+
+
+def shape_from_args(args: argparse.Namespace) -> ProjectShape:
+    return ProjectShape(files=args.files, classes=args.classes, methods=args.methods,
+                        functions=args.functions, density=args.density, seed=args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic Python project')
+    parser.add_argument('root', help='Directory to write the project into')
+    add_shape_arguments(parser)
+    args = parser.parse_args()
+
+    count = generate_project(args.root, shape_from_args(args))
+    print(f"Wrote {count} modules to {args.root}")
+
+
+if __name__ == '__main__':
+    main()
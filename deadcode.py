@@ -5,12 +5,48 @@ Analyzes Python codebases to identify potentially unused functions, classes, and
 """
 
 import ast
+import asyncio
+import csv
+import ctypes
+import ctypes.util
+import faulthandler
+import gzip
+import hashlib
+import heapq
+import json
 import os
+import pickle
+import select
+import stat
+import struct
+import subprocess
 import sys
+import threading
+import zlib
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_right
+from contextlib import ExitStack, contextmanager, nullcontext
+from errno import ENOENT
 from pathlib import Path
-from typing import Dict, List, Set, Optional, Tuple
-from dataclasses import dataclass
-from neo4j import GraphDatabase
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Set, Optional, Tuple
+from array import array
+from collections import Counter, OrderedDict, defaultdict, deque
+from fnmatch import fnmatchcase
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from socketserver import ThreadingMixIn, UnixStreamServer
+from urllib.parse import parse_qs, urlsplit
+try:
+    from neo4j import AsyncGraphDatabase, GraphDatabase
+except ImportError:  # only required by Neo4jBackend
+    AsyncGraphDatabase = GraphDatabase = None
+try:
+    import resource
+except ImportError:  # not available on Windows; peak RSS is then omitted
+    resource = None
 import argparse
 import logging
 
@@ -18,57 +54,347 @@ import logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-@dataclass
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_PROJECT = 'default'
+DEFAULT_ASYNC_WRITERS = 4
+DEFAULT_EXPORT_DIR = 'neo4j-import'
+EXCLUDED_DIRS = {'.git', '__pycache__', '.venv', 'venv', 'node_modules'}
+
+# Bump whenever CodeAnalyzer output changes so stale cache entries are ignored
+ANALYZER_VERSION = 4
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser('~'), '.cache', 'deadcode')
+DEFAULT_CACHE_SIZE_MB = 256
+DEFAULT_PROFILE_TOP_FILES = 20
+DEFAULT_POLL_INTERVAL = 0.5
+SHARD_FORMAT = 'deadcode-shard'
+DEFAULT_SERVE_HOST = '127.0.0.1'
+DEFAULT_QUERY_CACHE_SIZE = 256
+DEFAULT_MAX_FILE_SIZE_MB = 10
+DEFAULT_MOST_USED = 20
+
+# Where reachability analysis starts: functions named main, usages inside
+# `if __name__ == '__main__':`, names listed in __all__, test functions and
+# classes, and (opt-in) any module-level usage
+ROOT_KINDS = ('main', '__main__', '__all__', 'tests', 'module')
+DEFAULT_ROOT_KINDS = ('main', '__main__', '__all__', 'tests')
+
+def batched(items: Iterable, size: int) -> Iterator[list]:
+    """Yield lists of at most ``size`` items"""
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+class FileTable:
+    """Interns file paths so elements and usages carry a small integer id"""
+
+    def __init__(self):
+        self.ids: Dict[str, int] = {}
+        self.paths: List[str] = []
+
+    def intern(self, file_path: str) -> int:
+        file_id = self.ids.get(file_path)
+        if file_id is None:
+            file_id = len(self.paths)
+            self.ids[file_path] = file_id
+            self.paths.append(file_path)
+        return file_id
+
+    def path(self, file_id: int) -> str:
+        return self.paths[file_id]
+
+# Ids are only meaningful inside one process; pickled elements carry the path
+FILE_TABLE = FileTable()
+
 class CodeElement:
-    name: str
-    type: str  # 'function', 'class', 'variable', 'import'
-    file_path: str
-    line_number: int
-    is_used: bool = False
-    used_by: Set[str] = None
+    """A definition or import.
+
+    Slotted to keep per-instance overhead low on large trees: the file is
+    stored as a FILE_TABLE id, and used_by holds usage locations packed as
+    ``file_id << 32 | line`` in an array that is only allocated once the
+    element is first used. A line referencing the element several times is
+    recorded once per reference.
+    """
+    __slots__ = ('name', 'type', 'file_id', 'line_number', 'is_used', 'used_by',
+                 'end_line_number')
     
-    def __post_init__(self):
+    def __init__(self, name: str, type: str, file_path: str, line_number: int,
+                 is_used: bool = False, used_by: Optional[array] = None,
+                 end_line_number: Optional[int] = None):
+        self.name = sys.intern(name)
+        self.type = type  # 'function', 'class', 'variable', 'import'
+        self.file_id = FILE_TABLE.intern(file_path)
+        self.line_number = line_number
+        self.is_used = is_used
+        self.used_by = used_by
+        self.end_line_number = end_line_number
+        
+    @property
+    def file_path(self) -> str:
+        return FILE_TABLE.path(self.file_id)
+        
+    @property
+    def key(self) -> str:
+        return f"{self.file_path}::{self.name}"
+        
+    def add_usage(self, file_id: int, line_num: int) -> None:
+        location = file_id << 32 | line_num
         if self.used_by is None:
-            self.used_by = set()
+            self.used_by = array('q', (location,))
+        else:
+            self.used_by.append(location)
+            
+    def usage_locations(self) -> List[Tuple[int, int]]:
+        """(file_id, line) of every reference in file id, line order"""
+        if not self.used_by:
+            return []
+        return [(location >> 32, location & 0xFFFFFFFF) for location in sorted(self.used_by)]
+        
+    def __reduce__(self):
+        used_by = None
+        if self.used_by:
+            used_by = [(FILE_TABLE.path(file_id), line) for file_id, line in self.usage_locations()]
+        return (_restore_code_element, (self.name, self.type, self.file_path, self.line_number,
+                                        self.is_used, used_by, self.end_line_number))
+        
+    def __eq__(self, other):
+        if not isinstance(other, CodeElement):
+            return NotImplemented
+        return (self.name, self.type, self.file_id, self.line_number, self.is_used,
+                self.end_line_number, self.usage_locations()) == \
+               (other.name, other.type, other.file_id, other.line_number, other.is_used,
+                other.end_line_number, other.usage_locations())
+        
+    def __repr__(self):
+        return (f"CodeElement(name={self.name!r}, type={self.type!r}, "
+                f"file_path={self.file_path!r}, line_number={self.line_number!r}, "
+                f"is_used={self.is_used!r})")
+
+def _restore_code_element(name, type, file_path, line_number, is_used, used_by, end_line_number):
+    element = CodeElement(name, type, file_path, line_number, is_used,
+                          end_line_number=end_line_number)
+    for path, line in used_by or ():
+        element.add_usage(FILE_TABLE.intern(path), line)
+    return element
+
+def is_dead_code_candidate(element: CodeElement) -> bool:
+    """Definitions worth reporting; private names and entry points are skipped"""
+    return (element.type in ('function', 'class')
+            and not element.name.startswith('_')
+            and element.name not in ('main', '__init__'))
+
+def scope_path(path: str) -> str:
+    """A file or directory scope as the analyzed file paths spell it, without a trailing slash"""
+    return path.rstrip('/' + os.sep) or path
+
+def in_scope(file_path: str, scope: str) -> bool:
+    """Whether file_path is the scope file or lies under the scope directory ('' is everything)"""
+    if not scope:
+        return True
+    scope = scope_path(scope)
+    return file_path == scope or file_path.startswith(os.path.join(scope, ''))
+
+class SymbolIndex:
+    """Lookup tables mapping usage names to code element keys.
+
+    ``by_name`` holds exact element names, ``by_suffix`` every dotted suffix
+    of a qualified name so ``method`` finds ``Class.method`` without a scan.
+    """
+
+    def __init__(self):
+        self.by_name: Dict[str, List[str]] = defaultdict(list)
+        self.by_suffix: Dict[str, List[str]] = defaultdict(list)
+
+    @staticmethod
+    def suffixes(name: str) -> List[str]:
+        parts = name.split('.')
+        return ['.'.join(parts[i:]) for i in range(1, len(parts))]
+
+    def add(self, key: str, name: str) -> None:
+        self.by_name[name].append(key)
+        for suffix in self.suffixes(name):
+            self.by_suffix[suffix].append(key)
+
+    def remove(self, key: str, name: str) -> None:
+        for table, lookup_name in [(self.by_name, name)] + [(self.by_suffix, suffix)
+                                                            for suffix in self.suffixes(name)]:
+            keys = table[lookup_name]
+            keys.remove(key)
+            if not keys:
+                del table[lookup_name]
+
+    def lookup(self, usage_name: str) -> List[str]:
+        return self.by_name.get(usage_name, []) + self.by_suffix.get(usage_name, [])
+
+class ScopeIndex:
+    """Per-file sorted definition spans for finding the scope enclosing a line.
+
+    Spans are sorted by start line with a parent pointer per span, so a
+    lookup is a bisect followed by a walk up the (short) nesting chain.
+    """
+
+    def __init__(self, elements: Dict[str, CodeElement]):
+        spans_by_file: Dict[int, List[Tuple[int, int, str]]] = defaultdict(list)
+        for key, element in elements.items():
+            if element.type in ('function', 'class') and element.end_line_number:
+                spans_by_file[element.file_id].append(
+                    (element.line_number, element.end_line_number, key))
+                
+        self.files: Dict[int, Tuple[List[int], List[int], List[str], List[int]]] = {}
+        for file_id, spans in spans_by_file.items():
+            spans.sort(key=lambda span: (span[0], -span[1]))
+            starts, ends, keys, parents = [], [], [], []
+            stack: List[int] = []
+            for index, (start, end, key) in enumerate(spans):
+                while stack and ends[stack[-1]] < start:
+                    stack.pop()
+                parents.append(stack[-1] if stack else -1)
+                starts.append(start)
+                ends.append(end)
+                keys.append(key)
+                stack.append(index)
+            self.files[file_id] = (starts, ends, keys, parents)
+
+    def enclosing(self, file_id: int, line_num: int) -> Optional[str]:
+        """Key of the innermost function/class containing the line, if any"""
+        spans = self.files.get(file_id)
+        if spans is None:
+            return None
+        starts, ends, keys, parents = spans
+        index = bisect_right(starts, line_num) - 1
+        while index >= 0 and ends[index] < line_num:
+            index = parents[index]
+        return keys[index] if index >= 0 else None
+
+class UsageGraph:
+    """USES adjacency in compressed sparse row form over integer node ids.
+
+    ``targets[offsets[i]:offsets[i + 1]]`` are the nodes used by node ``i``,
+    so a traversal touches two flat arrays instead of per-node containers.
+    """
+
+    def __init__(self, keys: List[str], edges: Iterable[Tuple[str, str]]):
+        self.keys = keys
+        self.index = {key: i for i, key in enumerate(keys)}
+        sources = array('l')
+        destinations = array('l')
+        for user_key, used_key in edges:
+            sources.append(self.index[user_key])
+            destinations.append(self.index[used_key])
+            
+        counts = [0] * (len(keys) + 1)
+        for source in sources:
+            counts[source + 1] += 1
+        for i in range(len(keys)):
+            counts[i + 1] += counts[i]
+        self.offsets = array('l', counts)
+        
+        self.targets = array('l', bytes(len(destinations) * destinations.itemsize))
+        fill = array('l', self.offsets)
+        for source, destination in zip(sources, destinations):
+            self.targets[fill[source]] = destination
+            fill[source] += 1
+
+    def reachable(self, roots: Iterable[str]) -> bytearray:
+        """Breadth-first search from the root keys; returns a visited flag per node"""
+        seen = bytearray(len(self.keys))
+        queue = deque()
+        for key in roots:
+            node = self.index[key]
+            if not seen[node]:
+                seen[node] = 1
+                queue.append(node)
+                
+        offsets, targets = self.offsets, self.targets
+        while queue:
+            node = queue.popleft()
+            for target in targets[offsets[node]:offsets[node + 1]]:
+                if not seen[target]:
+                    seen[target] = 1
+                    queue.append(target)
+        return seen
+
+# Child-bearing fields per node type, reversed for CodeAnalyzer's stack; filled lazily
+_CHILD_FIELDS: Dict[type, Tuple[str, ...]] = {}
+
+def _child_fields(node_type: type) -> Tuple[str, ...]:
+    # The expression context (Load/Store/Del) never has children worth visiting
+    return tuple(reversed([field for field in node_type._fields if field != 'ctx']))
+
+class CodeAnalyzer:
+    """Collects the definitions, imports, usages, ``__main__`` blocks and
+    ``__all__`` exports of one module.
+
+    Nodes are walked with an explicit stack in ast.NodeVisitor's pre-order,
+    so deeply nested generated code cannot hit the recursion limit, and are
+    dispatched through a node type to handler table. Handlers get the name of
+    the enclosing class and return the one the node's children see.
+    """
 
-class CodeAnalyzer(ast.NodeVisitor):
     def __init__(self, file_path: str):
         self.file_path = file_path
         self.definitions: List[CodeElement] = []
         self.usages: List[Tuple[str, int]] = [] 
         self.imports: List[CodeElement] = []
-        self.current_class = None
+        self.main_blocks: List[Tuple[int, int]] = []
+        self.exports: List[str] = []
         
-    def visit_FunctionDef(self, node):
+    def visit(self, tree: ast.AST) -> None:
+        handlers = self.HANDLERS
+        child_fields = _CHILD_FIELDS
+        AST = ast.AST
+        stack: List[Tuple[ast.AST, Optional[str]]] = [(tree, None)]
+        pop = stack.pop
+        push = stack.append
+        while stack:
+            node, class_name = pop()
+            node_type = type(node)
+            handler = handlers.get(node_type)
+            if handler is not None:
+                class_name = handler(self, node, class_name)
+                
+            fields = child_fields.get(node_type)
+            if fields is None:
+                fields = child_fields[node_type] = _child_fields(node_type)
+            # Pushed last field, last item first so they pop in visiting order
+            for field in fields:
+                value = getattr(node, field, None)
+                if type(value) is list:
+                    for item in reversed(value):
+                        if isinstance(item, AST):
+                            push((item, class_name))
+                elif isinstance(value, AST):
+                    push((value, class_name))
+                    
+    def visit_FunctionDef(self, node, class_name):
         func_name = node.name
-        if self.current_class:
-            func_name = f"{self.current_class}.{func_name}"
+        if class_name:
+            func_name = f"{class_name}.{func_name}"
             
         self.definitions.append(CodeElement(
             name=func_name,
             type='function',
             file_path=self.file_path,
-            line_number=node.lineno
+            line_number=node.lineno,
+            end_line_number=node.end_lineno
         ))
-        self.generic_visit(node)
-        
-    def visit_AsyncFunctionDef(self, node):
-        self.visit_FunctionDef(node)
+        return class_name
         
-    def visit_ClassDef(self, node):
+    def visit_ClassDef(self, node, class_name):
         self.definitions.append(CodeElement(
             name=node.name,
             type='class',
             file_path=self.file_path,
-            line_number=node.lineno
+            line_number=node.lineno,
+            end_line_number=node.end_lineno
         ))
+        return node.name
         
-        old_class = self.current_class
-        self.current_class = node.name
-        self.generic_visit(node)
-        self.current_class = old_class
-        
-    def visit_Import(self, node):
+    def visit_Import(self, node, class_name):
         for alias in node.names:
             self.imports.append(CodeElement(
                 name=alias.name,
@@ -76,8 +402,9 @@ class CodeAnalyzer(ast.NodeVisitor):
                 file_path=self.file_path,
                 line_number=node.lineno
             ))
+        return class_name
             
-    def visit_ImportFrom(self, node):
+    def visit_ImportFrom(self, node, class_name):
         module = node.module or ''
         for alias in node.names:
             import_name = f"{module}.{alias.name}" if module else alias.name
@@ -87,162 +414,1531 @@ class CodeAnalyzer(ast.NodeVisitor):
                 file_path=self.file_path,
                 line_number=node.lineno
             ))
+        return class_name
             
-    def visit_Name(self, node):
-        if isinstance(node.ctx, ast.Load):
+    def visit_Name(self, node, class_name):
+        if type(node.ctx) is ast.Load:
             self.usages.append((node.id, node.lineno))
-        self.generic_visit(node)
+        return class_name
         
-    def visit_Attribute(self, node):
-        if isinstance(node.ctx, ast.Load):
+    def visit_Attribute(self, node, class_name):
+        if type(node.ctx) is ast.Load:
             # Handle method/attribute calls like obj.method()
-            if isinstance(node.value, ast.Name):
+            if type(node.value) is ast.Name:
                 attr_name = f"{node.value.id}.{node.attr}"
                 self.usages.append((attr_name, node.lineno))
-        self.generic_visit(node)
-
-class Neo4jDeadCodeDetector:
-    
-    def __init__(self, neo4j_uri: str, neo4j_user: str, neo4j_password: str):
-        self.driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
-        self.code_elements: Dict[str, CodeElement] = {}
+        return class_name
         
-    def close(self):
-        self.driver.close()
+    def visit_If(self, node, class_name):
+        # if __name__ == '__main__':
+        test = node.test
+        if (isinstance(test, ast.Compare) and len(test.ops) == 1
+                and isinstance(test.ops[0], ast.Eq)):
+            operands = [test.left, test.comparators[0]]
+            if (any(isinstance(op, ast.Name) and op.id == '__name__' for op in operands)
+                    and any(isinstance(op, ast.Constant) and op.value == '__main__'
+                            for op in operands)):
+                self.main_blocks.append((node.body[0].lineno, node.body[-1].end_lineno))
+        return class_name
         
-    def clear_database(self):
-        with self.driver.session() as session:
-            session.run("MATCH (n) DETACH DELETE n")
-            logger.info("Cleared existing Neo4j data")
-            
-    def analyze_directory(self, directory_path: str) -> None:
-        logger.info(f"Analyzing directory: {directory_path}")
+    def visit_Assign(self, node, class_name):
+        if any(isinstance(target, ast.Name) and target.id == '__all__' for target in node.targets):
+            self._record_exports(node.value)
+        return class_name
         
-        for root, dirs, files in os.walk(directory_path):
-            dirs[:] = [d for d in dirs if d not in {'.git', '__pycache__', '.venv', 'venv', 'node_modules'}]
+    def visit_AugAssign(self, node, class_name):
+        if isinstance(node.target, ast.Name) and node.target.id == '__all__':
+            self._record_exports(node.value)
+        return class_name
+        
+    def _record_exports(self, value):
+        if isinstance(value, (ast.List, ast.Tuple)):
+            for item in value.elts:
+                if isinstance(item, ast.Constant) and isinstance(item.value, str):
+                    self.exports.append(item.value)
+
+    HANDLERS = {
+        ast.FunctionDef: visit_FunctionDef,
+        ast.AsyncFunctionDef: visit_FunctionDef,
+        ast.ClassDef: visit_ClassDef,
+        ast.Import: visit_Import,
+        ast.ImportFrom: visit_ImportFrom,
+        ast.Name: visit_Name,
+        ast.Attribute: visit_Attribute,
+        ast.If: visit_If,
+        ast.Assign: visit_Assign,
+        ast.AugAssign: visit_AugAssign,
+    }
+
+class FileUpdate(NamedTuple):
+    """What DeadCodeDetector.update_files changed in the in-memory analysis"""
+    changed: Set[str]
+    removed: Set[str]
+    # Files whose usages were re-resolved, and elements whose is_used may have flipped
+    affected: Set[str]
+    touched: Set[str]
+
+class ResourceLimits(NamedTuple):
+    """Per-file guards against pathological inputs; 0 turns a guard off.
+
+    The parse timeout and memory cap are enforced in worker processes, the
+    only place a runaway ast.parse can be stopped or capped.
+    """
+    max_file_size: int = DEFAULT_MAX_FILE_SIZE_MB * 1024 * 1024  # bytes
+    parse_timeout: float = 0  # seconds per file
+    memory_limit: int = 0  # bytes of address space per worker, on top of its baseline
+
+    @property
+    def needs_workers(self) -> bool:
+        return bool(self.parse_timeout or self.memory_limit)
+
+class SkippedFile(NamedTuple):
+    """A file left out of the analysis, for the skip report"""
+    file_path: str
+    # 'too_large', 'timeout', 'memory', 'crashed', 'syntax_error' or 'error'
+    reason: str
+    detail: str
+    seconds: float
+
+class FileAnalysis(NamedTuple):
+    """Picklable result of analyzing a single file"""
+    file_path: str
+    content_hash: str
+    definitions: List[CodeElement]
+    imports: List[CodeElement]
+    usages: List[Tuple[str, int]]
+    main_blocks: List[Tuple[int, int]]
+    exports: List[str]
+
+def _exclude_match(relative_path: str, patterns: Iterable[str]) -> bool:
+    name = relative_path.rsplit('/', 1)[-1]
+    return any(fnmatchcase(relative_path, pattern) or fnmatchcase(name, pattern)
+               for pattern in patterns)
+
+def is_excluded(relative_path: str, patterns: Iterable[str]) -> bool:
+    """Whether an --exclude glob matches a '/'-separated path relative to the analyzed
+    directory, one of its parent directories, or the name of either"""
+    patterns = tuple(patterns)
+    parts = relative_path.split('/')
+    return any(_exclude_match('/'.join(parts[:end]), patterns)
+               for end in range(1, len(parts) + 1))
+
+def iter_python_files(directory_path: str, exclude: Iterable[str] = (),
+                      root: Optional[str] = None) -> Iterator[str]:
+    """Yield .py files under a directory depth-first in sorted order, like a sorted os.walk.
+
+    Entries matching an ``exclude`` glob (see is_excluded) are skipped along
+    with their subtree; paths are matched relative to ``root``, by default
+    the directory itself.
+    """
+    exclude = tuple(exclude)
+    prefix_length = len(os.path.join(root or directory_path, ''))
+    stack = [directory_path]
+    while stack:
+        current = stack.pop()
+        try:
+            with os.scandir(current) as it:
+                entries = sorted(it, key=lambda entry: entry.name)
+        except OSError as e:
+            logger.error(f"Cannot list {current}: {e}")
+            continue
             
-            for file in files:
-                if file.endswith('.py'):
-                    file_path = os.path.join(root, file)
-                    self.analyze_file(file_path)
-                    
-    def analyze_file(self, file_path: str) -> None:
+        subdirs = []
+        for entry in entries:
+            if exclude and _exclude_match(entry.path[prefix_length:].replace(os.sep, '/'), exclude):
+                continue
+            if entry.is_dir():
+                if entry.name not in EXCLUDED_DIRS and not entry.is_symlink():
+                    subdirs.append(entry.path)
+            elif entry.name.endswith('.py'):
+                yield entry.path
+        stack.extend(reversed(subdirs))
+
+def iter_shard_files(directory_path: str, index: int, count: int,
+                     exclude: Iterable[str] = ()) -> Iterator[str]:
+    """.py files of the top-level entries of a directory that belong to shard ``index`` of ``count``.
+
+    Entries are assigned by a stable hash of their name, so adding a package
+    does not move the others to a different shard.
+    """
+    try:
+        with os.scandir(directory_path) as it:
+            entries = sorted(it, key=lambda entry: entry.name)
+    except OSError as e:
+        logger.error(f"Cannot list {directory_path}: {e}")
+        return
+        
+    exclude = tuple(exclude)
+    for entry in entries:
+        if zlib.crc32(entry.name.encode('utf-8', 'surrogateescape')) % count != index:
+            continue
+        if exclude and _exclude_match(entry.name, exclude):
+            continue
+        if entry.is_dir():
+            if entry.name not in EXCLUDED_DIRS and not entry.is_symlink():
+                yield from iter_python_files(entry.path, exclude, root=directory_path)
+        elif entry.name.endswith('.py'):
+            yield entry.path
+
+def find_python_files(directory_path: str) -> List[str]:
+    """All .py files under a directory in a stable, sorted order"""
+    return list(iter_python_files(directory_path))
+
+class AnalysisCache:
+    """On-disk FileAnalysis store keyed by file path, content hash and analyzer version.
+
+    Entries are pickles sharded by digest prefix. Reads bump the entry mtime
+    so ``prune`` can evict least recently used entries beyond ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir: str = DEFAULT_CACHE_DIR,
+                 max_bytes: int = DEFAULT_CACHE_SIZE_MB * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def content_hash(content: bytes) -> str:
+        return hashlib.blake2b(content, digest_size=16).hexdigest()
+
+    def _entry_path(self, file_path: str, content_hash: str) -> str:
+        key = f"{ANALYZER_VERSION}\0{file_path}\0{content_hash}".encode('utf-8', 'surrogatepass')
+        digest = hashlib.sha256(key).hexdigest()
+        return os.path.join(self.cache_dir, digest[:2], f"{digest}.pickle")
+
+    def get(self, file_path: str, content_hash: str) -> Optional[FileAnalysis]:
+        entry_path = self._entry_path(file_path, content_hash)
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
+            with open(entry_path, 'rb') as f:
+                analysis = pickle.load(f)
+            os.utime(entry_path)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cache entry {entry_path}: {e}")
+            return None
+        return analysis
+
+    def put(self, file_path: str, content_hash: str, analysis: FileAnalysis) -> None:
+        entry_path = self._entry_path(file_path, content_hash)
+        tmp_path = f"{entry_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(entry_path), exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(analysis, f, protocol=pickle.HIGHEST_PROTOCOL)
+            # Atomic so concurrent workers never observe a partial entry
+            os.replace(tmp_path, entry_path)
+        except OSError as e:
+            logger.warning(f"Could not write cache entry for {file_path}: {e}")
+
+    def prune(self) -> None:
+        """Evict least recently used entries until the cache fits in max_bytes"""
+        entries = []
+        total = 0
+        if not os.path.isdir(self.cache_dir):
+            return
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total += stat.st_size
                 
-            tree = ast.parse(content, filename=file_path)
-            analyzer = CodeAnalyzer(file_path)
-            analyzer.visit(tree)
+        if total <= self.max_bytes:
+            return
             
-            for definition in analyzer.definitions:
-                key = f"{definition.file_path}::{definition.name}"
-                self.code_elements[key] = definition
-                
-            for import_elem in analyzer.imports:
-                key = f"{import_elem.file_path}::{import_elem.name}"
-                self.code_elements[key] = import_elem
-                
-            for usage_name, line_num in analyzer.usages:
-                self.mark_as_used(usage_name, file_path, line_num)
+        evicted = 0
+        for _, size, entry_path in sorted(entries):
+            try:
+                os.remove(entry_path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+            if total <= self.max_bytes:
+                break
+        logger.info(f"Evicted {evicted} analysis cache entries")
+
+def analyze_source(file_path: str, content: bytes,
+                   content_hash: Optional[str] = None) -> FileAnalysis:
+    """Parse and visit the content of one file; raises SyntaxError on invalid code"""
+    tree = ast.parse(content.decode('utf-8'), filename=file_path)
+    analyzer = CodeAnalyzer(file_path)
+    analyzer.visit(tree)
+    return FileAnalysis(file_path, content_hash or AnalysisCache.content_hash(content),
+                        analyzer.definitions, analyzer.imports, analyzer.usages,
+                        analyzer.main_blocks, analyzer.exports)
+
+def git_changed_files(directory_path: str, rev: str, exclude: Iterable[str] = ()) -> Set[str]:
+    """.py files under a directory that differ from ``rev`` or are untracked, as walk paths"""
+    def git(*args) -> List[str]:
+        result = subprocess.run(['git', '-C', directory_path, *args], check=True,
+                                capture_output=True, text=True)
+        return result.stdout.splitlines()
+        
+    try:
+        relative_paths = git('diff', '--name-only', '--no-renames', '--relative', rev, '--', '.')
+        relative_paths += git('ls-files', '--others', '--exclude-standard')
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"git failed: {e.stderr.strip()}") from e
+        
+    changed = set()
+    for relative_path in relative_paths:
+        parts = relative_path.split('/')
+        if (relative_path.endswith('.py') and not EXCLUDED_DIRS.intersection(parts[:-1])
+                and not is_excluded(relative_path, exclude)):
+            changed.add(os.path.join(directory_path, *parts))
+    return changed
+
+def git_file_content(directory_path: str, rev: str, file_path: str) -> Optional[bytes]:
+    """Content of a walk path at ``rev``, or None if it did not exist there"""
+    relative_path = os.path.relpath(file_path, directory_path).replace(os.sep, '/')
+    result = subprocess.run(['git', '-C', directory_path, 'show', f"{rev}:./{relative_path}"],
+                            capture_output=True)
+    return result.stdout if result.returncode == 0 else None
+
+def try_parse_file(file_path: str, cache: Optional[AnalysisCache] = None,
+                   limits: Optional[ResourceLimits] = None
+                   ) -> Tuple[Optional[FileAnalysis], Optional[Tuple[str, str]]]:
+    """Parse and visit one file, returning (analysis, None), or (None, (reason, detail))
+    when it is skipped; runs in worker processes when --jobs > 1"""
+    try:
+        if limits is not None and limits.max_file_size:
+            size = os.path.getsize(file_path)
+            if size > limits.max_file_size:
+                logger.warning(f"Skipping {file_path}: {size} bytes is over the "
+                               f"{limits.max_file_size} byte limit")
+                return None, ('too_large', f"{size} bytes, limit {limits.max_file_size}")
                 
-            logger.info(f"Analyzed: {file_path}")
+        with open(file_path, 'rb') as f:
+            content = f.read()
             
-        except Exception as e:
-            logger.error(f"Error analyzing {file_path}: {e}")
+        content_hash = AnalysisCache.content_hash(content)
+        if cache is not None:
+            analysis = cache.get(file_path, content_hash)
+            if analysis is not None:
+                return analysis, None
             
-    def mark_as_used(self, usage_name: str, file_path: str, line_num: int):
-        current_file_key = f"{file_path}::{usage_name}"
-        if current_file_key in self.code_elements:
-            self.code_elements[current_file_key].is_used = True
-            return
+        analysis = analyze_source(file_path, content, content_hash)
+        if cache is not None:
+            cache.put(file_path, content_hash, analysis)
+        return analysis, None
+        
+    except MemoryError:
+        logger.error(f"Error analyzing {file_path}: out of memory")
+        return None, ('memory', "out of memory")
+    except SyntaxError as e:
+        logger.error(f"Error analyzing {file_path}: {e}")
+        return None, ('syntax_error', str(e))
+    except Exception as e:
+        logger.error(f"Error analyzing {file_path}: {e}")
+        return None, ('error', f"{type(e).__name__}: {e}")
+
+def parse_file(file_path: str, cache: Optional[AnalysisCache] = None,
+               limits: Optional[ResourceLimits] = None) -> Optional[FileAnalysis]:
+    """try_parse_file without the reason a file was skipped"""
+    return try_parse_file(file_path, cache, limits)[0]
+
+ParseResult = Tuple[str, float, Optional[FileAnalysis], Optional[Tuple[str, str]]]
+
+def timed_parse_file(file_path: str, cache: Optional[AnalysisCache] = None,
+                     limits: Optional[ResourceLimits] = None) -> ParseResult:
+    """try_parse_file plus its path and wall time, for the profiler and the skip report"""
+    start = time.perf_counter()
+    analysis, skip = try_parse_file(file_path, cache, limits)
+    return file_path, time.perf_counter() - start, analysis, skip
+
+def init_parse_worker(limits: ResourceLimits) -> None:
+    """Pool initializer applying the per-worker memory cap, where RLIMIT_AS is enforced"""
+    if not limits.memory_limit or resource is None:
+        return
+    try:
+        with open('/proc/self/statm') as f:
+            baseline = int(f.read().split()[0]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        baseline = 0
+    soft = baseline + limits.memory_limit
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    if hard != resource.RLIM_INFINITY:
+        soft = min(soft, hard)
+    resource.setrlimit(resource.RLIMIT_AS, (soft, hard))
+
+_watchdog_output = None
+
+def guarded_parse_file(file_path: str, cache: Optional[AnalysisCache] = None,
+                       limits: Optional[ResourceLimits] = None) -> ParseResult:
+    """timed_parse_file for pool workers.
+
+    Past the parse timeout a watchdog thread ends the worker process, which
+    works even while ast.parse holds the GIL; parse_in_workers then reports
+    the file. Never call this in the main process.
+    """
+    global _watchdog_output
+    if limits is None or not limits.parse_timeout:
+        return timed_parse_file(file_path, cache, limits)
+    if _watchdog_output is None:
+        # The stack dump is noise next to the skip report
+        _watchdog_output = open(os.devnull, 'w')
+    faulthandler.dump_traceback_later(limits.parse_timeout, exit=True, file=_watchdog_output)
+    try:
+        return timed_parse_file(file_path, cache, limits)
+    finally:
+        faulthandler.cancel_dump_traceback_later()
+
+def _parse_isolated(worker, file_path: str, limits: ResourceLimits) -> ParseResult:
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=1, initializer=init_parse_worker,
+                             initargs=(limits,)) as pool:
+        try:
+            return pool.submit(worker, file_path).result()
+        except BrokenProcessPool:
+            seconds = time.perf_counter() - start
+    if limits.parse_timeout and seconds >= limits.parse_timeout:
+        skip = ('timeout', f"parsing took over {limits.parse_timeout}s")
+    else:
+        skip = ('crashed', "the worker process died, e.g. killed for using too much memory")
+    logger.warning(f"Skipping {file_path}: {skip[1]}")
+    return file_path, seconds, None, skip
+
+def parse_in_workers(file_paths: Iterable[str], jobs: int,
+                     cache: Optional[AnalysisCache] = None,
+                     limits: Optional[ResourceLimits] = None) -> Iterator[ParseResult]:
+    """Parse files in a process pool, yielding timed_parse_file results in input order.
+
+    At most ``jobs * 4`` files are in flight, so memory stays flat. A worker
+    that dies (parse timeout, or killed over memory) breaks the pool: the
+    files that were in flight are re-parsed one per fresh worker to single
+    out the culprit, which is reported as skipped, and the walk resumes on a
+    new pool.
+    """
+    limits = limits or ResourceLimits()
+    worker = partial(guarded_parse_file, cache=cache, limits=limits)
+    window = jobs * 4
+    file_paths = iter(file_paths)
+    while True:
+        # Paths whose results are still owed, in order, and their futures
+        in_flight: deque = deque()
+        futures: deque = deque()
+        with ProcessPoolExecutor(max_workers=jobs, initializer=init_parse_worker,
+                                 initargs=(limits,)) as pool:
+            try:
+                for file_path in file_paths:
+                    in_flight.append(file_path)
+                    futures.append(pool.submit(worker, file_path))
+                    if len(futures) >= window:
+                        result = futures[0].result()
+                        futures.popleft()
+                        in_flight.popleft()
+                        yield result
+                while futures:
+                    result = futures[0].result()
+                    futures.popleft()
+                    in_flight.popleft()
+                    yield result
+                return
+            except BrokenProcessPool:
+                logger.warning(f"A parser worker died; re-parsing {len(in_flight)} files "
+                               f"one at a time")
+        for file_path in in_flight:
+            yield _parse_isolated(worker, file_path, limits)
+
+class PollingWatcher:
+    """Detects changed .py files by comparing (mtime, size) snapshots of the tree"""
+
+    def __init__(self, directory_path: str, interval: float = DEFAULT_POLL_INTERVAL):
+        self.directory_path = directory_path
+        self.interval = interval
+        self.snapshot = self._snapshot()
+
+    def _snapshot(self) -> Dict[str, Tuple[int, int]]:
+        snapshot = {}
+        for file_path in iter_python_files(self.directory_path):
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            snapshot[file_path] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def wait(self) -> Set[str]:
+        """Block until files are added, modified or removed; return their paths"""
+        while True:
+            time.sleep(self.interval)
+            snapshot = self._snapshot()
+            changed = {path for path in snapshot.keys() | self.snapshot.keys()
+                       if snapshot.get(path) != self.snapshot.get(path)}
+            self.snapshot = snapshot
+            if changed:
+                return changed
+
+    def close(self):
+        pass
+
+class InotifyWatcher:
+    """Linux inotify watches on every directory of the tree, through ctypes.
+
+    File events map straight to paths; directory creation, removal or renames
+    rescan the tree and report the files that appeared or disappeared.
+    """
+
+    IN_MODIFY = 0x00000002
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE
+                  | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+    EVENT = struct.Struct('iIII')
+    # Editors save through temp files and renames; wait for the burst to settle
+    SETTLE_SECONDS = 0.05
+
+    def __init__(self, directory_path: str):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify is only available on Linux")
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.directory_path = directory_path
+        self.watches: Dict[int, str] = {}
+        try:
+            self._watch_tree(directory_path)
+        except OSError:
+            self.close()
+            raise
+        self.files = set(iter_python_files(directory_path))
+
+    def _watch_tree(self, directory_path: str) -> None:
+        stack = [directory_path]
+        while stack:
+            current = stack.pop()
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(current), self.WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == ENOENT:
+                    continue
+                raise OSError(err, f"inotify_add_watch failed for {current}: {os.strerror(err)}")
+            self.watches[wd] = current
+            try:
+                with os.scandir(current) as it:
+                    stack.extend(entry.path for entry in it
+                                 if entry.is_dir() and not entry.is_symlink()
+                                 and entry.name not in EXCLUDED_DIRS)
+            except OSError:
+                continue
+
+    def _read_events(self, timeout: Optional[float]) -> Tuple[Set[str], bool]:
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set(), False
+        data = os.read(self.fd, 64 * 1024)
+        changed = set()
+        rescan = False
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self.EVENT.unpack_from(data, offset)
+            offset += self.EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
             
-        for key, element in self.code_elements.items():
-            if element.name == usage_name or element.name.endswith(f".{usage_name}"):
-                element.is_used = True
-                element.used_by.add(f"{file_path}:{line_num}")
-                
-    def create_graph_nodes(self):
-        with self.driver.session() as session:
-            for element in self.code_elements.values():
-                session.run("""
-                    CREATE (e:CodeElement {
-                        name: $name,
-                        type: $type,
-                        file_path: $file_path,
-                        line_number: $line_number,
-                        is_used: $is_used,
-                        id: $id
-                    })
-                """, 
+            if mask & self.IN_Q_OVERFLOW:
+                rescan = True
+            elif mask & self.IN_IGNORED:
+                self.watches.pop(wd, None)
+            elif mask & self.IN_ISDIR:
+                if name in EXCLUDED_DIRS:
+                    continue
+                if mask & (self.IN_CREATE | self.IN_MOVED_TO) and wd in self.watches:
+                    self._watch_tree(os.path.join(self.watches[wd], name))
+                rescan = True
+            elif name.endswith('.py') and wd in self.watches:
+                changed.add(os.path.join(self.watches[wd], name))
+        return changed, rescan
+
+    def wait(self) -> Set[str]:
+        """Block until files are added, modified or removed; return their paths"""
+        changed, rescan = self._read_events(None)
+        while True:
+            more, more_rescan = self._read_events(self.SETTLE_SECONDS)
+            if not more and not more_rescan:
+                break
+            changed |= more
+            rescan = rescan or more_rescan
+            
+        if rescan:
+            files = set(iter_python_files(self.directory_path))
+            changed |= files ^ self.files
+            self.files = files
+        else:
+            for path in changed:
+                if os.path.exists(path):
+                    self.files.add(path)
+                else:
+                    self.files.discard(path)
+        return changed
+
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+def make_watcher(directory_path: str, poll_interval: float = DEFAULT_POLL_INTERVAL):
+    """An InotifyWatcher where the platform supports it, else a PollingWatcher"""
+    try:
+        return InotifyWatcher(directory_path)
+    except (OSError, AttributeError) as e:
+        logger.info(f"inotify unavailable ({e}); polling every {poll_interval}s")
+        return PollingWatcher(directory_path, poll_interval)
+
+class Profiler:
+    """Wall time and counters per phase, slowest files and peak RSS for --profile.
+
+    Counters are attributed to the overall totals and to every phase open
+    when they are recorded, so nested phases report inclusive figures.
+    """
+
+    def __init__(self, top_files: int = DEFAULT_PROFILE_TOP_FILES):
+        self.top_files = top_files
+        self.started = time.perf_counter()
+        self.phases: Dict[str, dict] = {}
+        self.counters: Dict[str, int] = defaultdict(int)
+        self.active: List[dict] = []
+        # Min-heap of (seconds, path) holding the slowest top_files files
+        self.slowest: List[Tuple[float, str]] = []
+
+    @contextmanager
+    def phase(self, name: str):
+        stats = self.phases.setdefault(name, {'seconds': 0.0, 'calls': 0, 'counts': defaultdict(int)})
+        self.active.append(stats)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            stats['seconds'] += time.perf_counter() - start
+            stats['calls'] += 1
+            self.active.pop()
+
+    def count(self, name: str, n: int = 1) -> None:
+        self.counters[name] += n
+        for stats in self.active:
+            stats['counts'][name] += n
+
+    def record_file(self, file_path: str, seconds: float) -> None:
+        self.count('files_parsed')
+        if len(self.slowest) < self.top_files:
+            heapq.heappush(self.slowest, (seconds, file_path))
+        elif seconds > self.slowest[0][0]:
+            heapq.heapreplace(self.slowest, (seconds, file_path))
+
+    @staticmethod
+    def peak_rss() -> Dict[str, Optional[int]]:
+        """Peak resident set size in bytes of this process and of reaped workers"""
+        if resource is None:
+            return {'self': None, 'children': None}
+        # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+        scale = 1 if sys.platform == 'darwin' else 1024
+        return {
+            'self': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale,
+            'children': resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale,
+        }
+
+    def report(self) -> dict:
+        return {
+            'total_seconds': time.perf_counter() - self.started,
+            'phases': {
+                name: {'seconds': stats['seconds'], 'calls': stats['calls'],
+                       'counts': dict(stats['counts'])}
+                for name, stats in self.phases.items()
+            },
+            'counters': dict(self.counters),
+            'slowest_files': [{'path': path, 'seconds': seconds}
+                              for seconds, path in sorted(self.slowest, reverse=True)],
+            'peak_rss_bytes': self.peak_rss(),
+        }
+
+class NullProfiler:
+    """Stand-in used when profiling is off; every hook is a no-op"""
+
+    _phase = nullcontext()
+
+    def phase(self, name: str):
+        return self._phase
+
+    def count(self, name: str, n: int = 1) -> None:
+        pass
+
+    def record_file(self, file_path: str, seconds: float) -> None:
+        pass
+
+    def report(self) -> dict:
+        return {}
+
+NULL_PROFILER = NullProfiler()
+
+class UsageStatistics:
+    """Per-type element counts kept up to date as elements are added, used and removed.
+
+    Counts are held for the whole project, for every file and for every
+    directory above a file up to ``root`` (so a directory covers its subtree;
+    without a root directories climb to the top of the path), which makes
+    statistics and per-directory breakdowns lookups instead of graph scans.
+    Scopes changed since the last ``take_dirty`` are tracked so only their
+    summary rows need rewriting.
+    """
+
+    SCOPE_KINDS = ('project', 'directory', 'file')
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = scope_path(root) if root else None
+        # (scope kind, scope) -> type -> [total, used]
+        self.counts: Dict[Tuple[str, str], Dict[str, List[int]]] = defaultdict(dict)
+        self.file_scopes: Dict[int, List[Tuple[str, str]]] = {}
+        self.dirty: Set[Tuple[str, str]] = set()
+
+    def scopes(self, file_id: int) -> List[Tuple[str, str]]:
+        scopes = self.file_scopes.get(file_id)
+        if scopes is None:
+            file_path = FILE_TABLE.path(file_id)
+            scopes = [('project', ''), ('file', file_path)]
+            directory = os.path.dirname(file_path)
+            while directory:
+                scopes.append(('directory', directory))
+                if directory == self.root:
+                    break
+                parent = os.path.dirname(directory)
+                if parent == directory:
+                    break
+                directory = parent
+            self.file_scopes[file_id] = scopes
+        return scopes
+
+    def _update(self, element: CodeElement, total: int, used: int) -> None:
+        for scope in self.scopes(element.file_id):
+            counts = self.counts[scope].get(element.type)
+            if counts is None:
+                counts = self.counts[scope][element.type] = [0, 0]
+            counts[0] += total
+            counts[1] += used
+            self.dirty.add(scope)
+
+    def add(self, element: CodeElement) -> None:
+        self._update(element, 1, 1 if element.is_used else 0)
+
+    def remove(self, element: CodeElement) -> None:
+        self._update(element, -1, -1 if element.is_used else 0)
+
+    def mark_used(self, element: CodeElement) -> None:
+        self._update(element, 0, 1)
+
+    def mark_unused(self, element: CodeElement) -> None:
+        self._update(element, 0, -1)
+
+    def get(self, kind: str = 'project', scope: str = '') -> Dict[str, Dict[str, int]]:
+        """{type: {'total', 'used', 'unused'}} for one scope; empty if it has no elements"""
+        return {code_type: {'total': total, 'used': used, 'unused': total - used}
+                for code_type, (total, used) in self.counts.get((kind, scope), {}).items()
+                if total}
+
+    def breakdown(self, kind: str, path: str = '') -> Dict[str, Dict[str, Dict[str, int]]]:
+        """get() for every non-empty scope of one kind under ``path``, keyed and sorted by scope"""
+        breakdown = {}
+        for scope_kind, scope in sorted(self.counts):
+            if scope_kind == kind and in_scope(scope, path):
+                stats = self.get(kind, scope)
+                if stats:
+                    breakdown[scope] = stats
+        return breakdown
+
+    def rows(self, scopes: Optional[Iterable[Tuple[str, str]]] = None
+             ) -> Iterator[Tuple[str, str, str, int, int]]:
+        """(kind, scope, type, total, used) rows; emptied types are kept so they can be deleted"""
+        for scope in sorted(self.counts if scopes is None else scopes):
+            for code_type, (total, used) in self.counts.get(scope, {}).items():
+                yield scope[0], scope[1], code_type, total, used
+
+    def take_dirty(self) -> Set[Tuple[str, str]]:
+        dirty, self.dirty = self.dirty, set()
+        return dirty
+
+class UnsupportedOperationError(RuntimeError):
+    """A backend was asked for an operation it deliberately does not provide"""
+
+class GraphBackend(ABC):
+    """Storage the detector writes its analysis to and reads results back from.
+
+    Elements are addressed by their key (``file_path::name``); edges are
+    ``(user_key, used_key, lines)`` tuples, one per pair, with the sorted
+    line of every reference, so a line appears as often as it references the
+    used element. Writing a pair again replaces its lines. Files
+    belong to the module (directory) they are in, and each element to its file.
+    """
+
+    profiler = NULL_PROFILER
+
+    def close(self):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        raise NotImplementedError
+
+    def create_schema(self):
+        pass
+
+    @abstractmethod
+    def write_nodes(self, elements: Iterable[CodeElement]) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def write_relationships(self, edges: Iterable[Tuple[str, str, Tuple[int, ...]]]) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    def write_files(self, file_hashes: Iterable[Tuple[str, str]]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def write_modules(self, modules: Iterable[Tuple[str, Optional[str]]]) -> None:
+        """Store (directory, parent directory or None at the top) module rows"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def stored_file_hashes(self) -> Dict[str, str]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete_files(self, file_paths: Iterable[str]) -> None:
+        """Drop the files with their elements and edges, then any module left empty"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def stored_is_used(self) -> Iterator[Tuple[str, bool]]:
+        raise NotImplementedError
+
+    @abstractmethod
+    def update_is_used(self, rows: Iterable[Tuple[str, bool]]) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_dead_code(self, path: str = '') -> Iterator[Tuple[CodeElement, int]]:
+        """Yield (element, usages recorded on USES edges into it) for dead code in file, line order,
+        only in the file or under the directory ``path`` if given"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_unused_imports(self, path: str = '') -> Iterator[CodeElement]:
+        """Yield unused imports in file, line order, scoped like iter_dead_code"""
+        raise NotImplementedError
+
+    @abstractmethod
+    def iter_most_used(self, limit: int = DEFAULT_MOST_USED) -> Iterator[Tuple[CodeElement, int]]:
+        """Yield (element, usages recorded on USES edges into it) for the ``limit`` most used
+        functions, classes and variables, most used first"""
+        raise NotImplementedError
+
+    def find_dead_code(self, path: str = '') -> List[CodeElement]:
+        return [element for element, _ in self.iter_dead_code(path)]
+
+    @abstractmethod
+    def write_statistics(self, rows: Iterable[Tuple[str, str, str, int, int]],
+                         replace: bool = False) -> None:
+        """Store UsageStatistics rows as summary records, dropping those whose total is 0.
+
+        With ``replace`` every previously stored summary of the project goes first.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_usage_statistics(self, kind: str = 'project',
+                             scope: str = '') -> Dict[str, Dict[str, int]]:
+        """Per-type totals for one scope, read from the stored summaries"""
+        raise NotImplementedError
+
+class InMemoryBackend(GraphBackend):
+    """Graph kept in plain dicts; needs no database and answers queries natively"""
+
+    def __init__(self):
+        self.nodes: Dict[str, CodeElement] = {}
+        # (user_key, used_key) -> sorted usage lines
+        self.edges: Dict[Tuple[str, str], Tuple[int, ...]] = {}
+        self.files: Dict[str, str] = {}
+        # Module directory -> parent directory, None at the top
+        self.modules: Dict[str, Optional[str]] = {}
+        self.summaries: Dict[Tuple[str, str, str], Tuple[int, int]] = {}
+
+    def clear(self):
+        self.nodes.clear()
+        self.edges.clear()
+        self.files.clear()
+        self.modules.clear()
+        self.summaries.clear()
+
+    def write_nodes(self, elements: Iterable[CodeElement]) -> int:
+        count = 0
+        for element in elements:
+            self.nodes[element.key] = CodeElement(
                 name=element.name,
                 type=element.type,
                 file_path=element.file_path,
                 line_number=element.line_number,
-                is_used=element.is_used,
-                id=f"{element.file_path}::{element.name}"
-                )
-                
-        logger.info("Created Neo4j nodes for code elements")
-        
-    def create_usage_relationships(self):
+                is_used=element.is_used
+            )
+            count += 1
+        self.profiler.count('rows_written', count)
+        return count
+
+    def write_relationships(self, edges: Iterable[Tuple[str, str, Tuple[int, ...]]]) -> int:
+        count = 0
+        for user_key, used_key, lines in edges:
+            if user_key in self.nodes and used_key in self.nodes:
+                self.edges[user_key, used_key] = tuple(lines)
+                count += 1
+        self.profiler.count('rows_written', count)
+        return count
+
+    def write_files(self, file_hashes: Iterable[Tuple[str, str]]) -> None:
+        file_hashes = dict(file_hashes)
+        self.files.update(file_hashes)
+        self.profiler.count('rows_written', len(file_hashes))
+
+    def write_modules(self, modules: Iterable[Tuple[str, Optional[str]]]) -> None:
+        modules = dict(modules)
+        self.modules.update(modules)
+        self.profiler.count('rows_written', len(modules))
+
+    def stored_file_hashes(self) -> Dict[str, str]:
+        return dict(self.files)
+
+    def delete_files(self, file_paths: Iterable[str]) -> None:
+        file_paths = set(file_paths)
+        deleted = {key for key, node in self.nodes.items() if node.file_path in file_paths}
+        for key in deleted:
+            del self.nodes[key]
+        self.edges = {pair: lines for pair, lines in self.edges.items()
+                      if pair[0] not in deleted and pair[1] not in deleted}
+        for path in file_paths:
+            self.files.pop(path, None)
+        while True:
+            occupied = {os.path.dirname(path) for path in self.files}
+            occupied.update(self.modules.values())
+            empty = [path for path in self.modules if path not in occupied]
+            if not empty:
+                break
+            for path in empty:
+                del self.modules[path]
+
+    def stored_is_used(self) -> Iterator[Tuple[str, bool]]:
+        for key, node in self.nodes.items():
+            yield key, node.is_used
+
+    def update_is_used(self, rows: Iterable[Tuple[str, bool]]) -> None:
+        count = 0
+        for key, is_used in rows:
+            if key in self.nodes:
+                self.nodes[key].is_used = is_used
+                count += 1
+        self.profiler.count('rows_written', count)
+
+    def iter_dead_code(self, path: str = '') -> Iterator[Tuple[CodeElement, int]]:
+        dead_code = [
+            node for node in self.nodes.values()
+            if not node.is_used and is_dead_code_candidate(node) and in_scope(node.file_path, path)
+        ]
+        dead_code.sort(key=lambda node: (node.file_path, node.line_number))
+        # Unused elements have no usages, so no edges point at them
+        for node in dead_code:
+            yield node, 0
+
+    def iter_unused_imports(self, path: str = '') -> Iterator[CodeElement]:
+        imports = [node for node in self.nodes.values()
+                   if node.type == 'import' and not node.is_used
+                   and in_scope(node.file_path, path)]
+        imports.sort(key=lambda node: (node.file_path, node.line_number))
+        yield from imports
+
+    def _usage_counts(self) -> Counter:
+        usage_counts = Counter()
+        for (_, used_key), lines in self.edges.items():
+            usage_counts[used_key] += len(lines)
+        return usage_counts
+
+    def iter_most_used(self, limit: int = DEFAULT_MOST_USED) -> Iterator[Tuple[CodeElement, int]]:
+        ranked = heapq.nsmallest(
+            limit, ((-count, self.nodes[key].file_path, self.nodes[key].line_number, key)
+                    for key, count in self._usage_counts().items()
+                    if self.nodes[key].type != 'import'))
+        for negated_count, _, _, key in ranked:
+            yield self.nodes[key], -negated_count
+
+    def write_statistics(self, rows: Iterable[Tuple[str, str, str, int, int]],
+                         replace: bool = False) -> None:
+        if replace:
+            self.summaries.clear()
+        count = 0
+        for kind, scope, code_type, total, used in rows:
+            if total:
+                self.summaries[kind, scope, code_type] = (total, used)
+            else:
+                self.summaries.pop((kind, scope, code_type), None)
+            count += 1
+        self.profiler.count('rows_written', count)
+
+    def get_usage_statistics(self, kind: str = 'project',
+                             scope: str = '') -> Dict[str, Dict[str, int]]:
+        return {code_type: {'total': total, 'used': used, 'unused': total - used}
+                for (row_kind, row_scope, code_type), (total, used) in self.summaries.items()
+                if row_kind == kind and row_scope == scope}
+
+class CsvExportBackend(GraphBackend):
+    """Graph streamed to header + data CSV files for ``neo4j-admin database import``.
+
+    Rows are written as they arrive and never read back, so memory stays flat
+    however large the graph; only dead-code candidates and project-wide
+    statistics are kept to answer the report. The files can only be written in one pass:
+    incremental syncs and is_used updates are not supported.
+    """
+
+    NODE_HEADER = ['id:ID(CodeElement)', 'project', 'name', 'type', 'file_path',
+                   'line_number:int', 'is_used:boolean', ':LABEL']
+    RELATIONSHIP_HEADER = [':START_ID(CodeElement)', ':END_ID(CodeElement)', 'project',
+                           'count:int', 'lines:int[]', ':TYPE']
+    FILE_HEADER = ['path:ID(File)', 'project', 'content_hash', ':LABEL']
+    MODULE_HEADER = ['path:ID(Module)', 'project', 'name', ':LABEL']
+    DEFINES_HEADER = [':START_ID(File)', ':END_ID(CodeElement)', 'project', ':TYPE']
+    CONTAINS_FILE_HEADER = [':START_ID(Module)', ':END_ID(File)', 'project', ':TYPE']
+    CONTAINS_MODULE_HEADER = [':START_ID(Module)', ':END_ID(Module)', 'project', ':TYPE']
+    SUMMARY_HEADER = ['id:ID(UsageSummary)', 'project', 'scope_kind', 'scope', 'type',
+                      'total:int', 'used:int', 'unused:int', ':LABEL']
+
+    def __init__(self, export_dir: str, compress: bool = False, project: str = DEFAULT_PROJECT):
+        self.export_dir = export_dir
+        self.compress = compress
+        self.project = project
+        self.handles: Dict[str, object] = {}
+        self.writers: Dict[str, object] = {}
+        self.dead_code: List[CodeElement] = []
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def data_path(self, name: str) -> str:
+        return os.path.join(self.export_dir, f"{name}.csv.gz" if self.compress else f"{name}.csv")
+
+    def header_path(self, name: str) -> str:
+        return os.path.join(self.export_dir, f"{name}_header.csv")
+
+    def _writer(self, name: str, header: List[str]):
+        if name not in self.writers:
+            os.makedirs(self.export_dir, exist_ok=True)
+            with open(self.header_path(name), 'w', newline='') as f:
+                csv.writer(f).writerow(header)
+            if self.compress:
+                handle = gzip.open(self.data_path(name), 'wt', newline='', encoding='utf-8')
+            else:
+                handle = open(self.data_path(name), 'w', newline='', encoding='utf-8')
+            self.handles[name] = handle
+            self.writers[name] = csv.writer(handle)
+        return self.writers[name]
+
+    def import_command(self) -> str:
+        """The neo4j-admin invocation that loads the exported files"""
+        def files(name):
+            return f"{self.header_path(name)},{self.data_path(name)}"
+        parts = ["neo4j-admin database import full"]
+        if 'code_elements' in self.writers:
+            parts.append(f"--nodes={files('code_elements')}")
+        for name in ('files', 'modules', 'usage_summaries'):
+            if name in self.writers:
+                parts.append(f"--nodes={files(name)}")
+        for name in ('uses', 'defines', 'contains_files', 'contains_modules'):
+            if name in self.writers:
+                parts.append(f"--relationships={files(name)}")
+        return ' '.join(parts + ["neo4j"])
+
+    def close(self):
+        for handle in self.handles.values():
+            handle.close()
+        if self.handles:
+            logger.info(f"Exported CSV files to {self.export_dir}; load them with: "
+                        f"{self.import_command()}")
+        self.handles.clear()
+        self.writers.clear()
+
+    def clear(self):
+        self.close()
+        for name in ('code_elements', 'uses', 'files', 'usage_summaries', 'modules', 'defines',
+                     'contains_files', 'contains_modules'):
+            for path in (self.header_path(name), self.data_path(name)):
+                if os.path.exists(path):
+                    os.remove(path)
+        self.dead_code.clear()
+        self.stats.clear()
+
+    def write_nodes(self, elements: Iterable[CodeElement]) -> int:
+        writer = self._writer('code_elements', self.NODE_HEADER)
+        defines = self._writer('defines', self.DEFINES_HEADER)
+        count = 0
+        for element in elements:
+            writer.writerow([element.key, self.project, element.name, element.type,
+                             element.file_path, element.line_number,
+                             'true' if element.is_used else 'false', 'CodeElement'])
+            defines.writerow([element.file_path, element.key, self.project,
+                              'IMPORTS' if element.type == 'import' else 'DEFINES'])
+            if not element.is_used and is_dead_code_candidate(element):
+                self.dead_code.append(CodeElement(element.name, element.type, element.file_path,
+                                                  element.line_number))
+            count += 1
+        self.profiler.count('rows_written', count)
+        return count
+
+    def write_relationships(self, edges: Iterable[Tuple[str, str, Tuple[int, ...]]]) -> int:
+        writer = self._writer('uses', self.RELATIONSHIP_HEADER)
+        count = 0
+        for user_key, used_key, lines in edges:
+            # neo4j-admin splits array values on ';'
+            writer.writerow([user_key, used_key, self.project, len(lines),
+                             ';'.join(map(str, lines)), 'USES'])
+            count += 1
+        self.profiler.count('rows_written', count)
+        return count
+
+    def write_files(self, file_hashes: Iterable[Tuple[str, str]]) -> None:
+        writer = self._writer('files', self.FILE_HEADER)
+        contains = self._writer('contains_files', self.CONTAINS_FILE_HEADER)
+        count = 0
+        for path, content_hash in file_hashes:
+            writer.writerow([path, self.project, content_hash, 'File'])
+            if os.path.dirname(path):
+                contains.writerow([os.path.dirname(path), path, self.project, 'CONTAINS'])
+            count += 1
+        self.profiler.count('rows_written', count)
+
+    def write_modules(self, modules: Iterable[Tuple[str, Optional[str]]]) -> None:
+        writer = self._writer('modules', self.MODULE_HEADER)
+        contains = self._writer('contains_modules', self.CONTAINS_MODULE_HEADER)
+        count = 0
+        for path, parent in modules:
+            writer.writerow([path, self.project, os.path.basename(path) or path, 'Module'])
+            if parent is not None:
+                contains.writerow([parent, path, self.project, 'CONTAINS'])
+            count += 1
+        self.profiler.count('rows_written', count)
+
+    def stored_file_hashes(self) -> Dict[str, str]:
+        raise UnsupportedOperationError("CSV export cannot be updated incrementally")
+
+    def delete_files(self, file_paths: Iterable[str]) -> None:
+        raise UnsupportedOperationError("CSV export cannot be updated incrementally")
+
+    def stored_is_used(self) -> Iterator[Tuple[str, bool]]:
+        raise UnsupportedOperationError("CSV export cannot be updated incrementally")
+
+    def update_is_used(self, rows: Iterable[Tuple[str, bool]]) -> None:
+        raise UnsupportedOperationError("CSV export rows are final once written")
+
+    def iter_dead_code(self, path: str = '') -> Iterator[Tuple[CodeElement, int]]:
+        # Unused elements have no usages, so no USES rows point at them
+        for node in sorted(self.dead_code, key=lambda node: (node.file_path, node.line_number)):
+            if in_scope(node.file_path, path):
+                yield node, 0
+
+    def iter_unused_imports(self, path: str = '') -> Iterator[CodeElement]:
+        raise UnsupportedOperationError("CSV export only keeps dead-code candidates; "
+                                        "query the imported database instead")
+
+    def iter_most_used(self, limit: int = DEFAULT_MOST_USED) -> Iterator[Tuple[CodeElement, int]]:
+        raise UnsupportedOperationError("CSV export does not keep USES rows to rank; "
+                                        "query the imported database instead")
+
+    def write_statistics(self, rows: Iterable[Tuple[str, str, str, int, int]],
+                         replace: bool = False) -> None:
+        writer = self._writer('usage_summaries', self.SUMMARY_HEADER)
+        count = 0
+        for kind, scope, code_type, total, used in rows:
+            if not total:
+                continue
+            writer.writerow([f"{kind}:{scope}:{code_type}", self.project, kind, scope, code_type,
+                             total, used, total - used, 'UsageSummary'])
+            if kind == 'project':
+                self.stats[code_type] = {'total': total, 'used': used, 'unused': total - used}
+            count += 1
+        self.profiler.count('rows_written', count)
+
+    def get_usage_statistics(self, kind: str = 'project',
+                             scope: str = '') -> Dict[str, Dict[str, int]]:
+        if kind != 'project':
+            raise UnsupportedOperationError("CSV export only keeps project-wide statistics")
+        return {code_type: dict(data) for code_type, data in self.stats.items()}
+
+class Neo4jBackend(GraphBackend):
+    """Graph stored in Neo4j, scoped by project and written in UNWIND batches.
+
+    (:Module)-[:CONTAINS]->(:Module|File) mirrors the directory tree and
+    (:File)-[:DEFINES|IMPORTS]->(:CodeElement) links each element to its file,
+    so queries scoped to a directory or file start from an index seek.
+    """
+
+    NODES_QUERY = """
+        UNWIND $rows AS row
+        CREATE (e:CodeElement {
+            project: $project,
+            name: row.name,
+            type: row.type,
+            file_path: row.file_path,
+            line_number: row.line_number,
+            is_used: row.is_used,
+            id: row.id
+        })
+        MERGE (f:File {project: $project, path: row.file_path})
+        FOREACH (_ IN CASE WHEN row.type = 'import' THEN [1] ELSE [] END |
+            CREATE (f)-[:IMPORTS {project: $project}]->(e))
+        FOREACH (_ IN CASE WHEN row.type <> 'import' THEN [1] ELSE [] END |
+            CREATE (f)-[:DEFINES {project: $project}]->(e))
+    """
+    RELATIONSHIPS_QUERY = """
+        UNWIND $rows AS row
+        MATCH (user:CodeElement {project: $project, id: row.user_id})
+        MATCH (used:CodeElement {project: $project, id: row.used_id})
+        MERGE (user)-[r:USES]->(used)
+        SET r.project = $project, r.count = size(row.lines), r.lines = row.lines
+    """
+    FILES_QUERY = """
+        UNWIND $rows AS row
+        MERGE (f:File {project: $project, path: row.path})
+        SET f.content_hash = row.content_hash
+        WITH f, row WHERE row.directory <> ''
+        MERGE (m:Module {project: $project, path: row.directory})
+        MERGE (m)-[:CONTAINS {project: $project}]->(f)
+    """
+    MODULES_QUERY = """
+        UNWIND $rows AS row
+        MERGE (m:Module {project: $project, path: row.path})
+        SET m.name = row.name
+        WITH m, row WHERE row.parent IS NOT NULL
+        MERGE (p:Module {project: $project, path: row.parent})
+        MERGE (p)-[:CONTAINS {project: $project}]->(m)
+    """
+    # Files in a scope: the file itself, or every file under the module
+    SCOPE_FILES = """
+        CALL {
+            MATCH (f:File {project: $project, path: $path})
+            RETURN f
+            UNION
+            MATCH (:Module {project: $project, path: $path})-[:CONTAINS*]->(f:File)
+            RETURN f
+        }
+    """
+    DEAD_CODE_FILTER = """
+        WHERE e.type IN ['function', 'class']
+        AND NOT e.name STARTS WITH '_'
+        AND NOT e.name IN ['main', '__init__']
+        // Unused elements have no incoming USES relationships
+        RETURN e.name as name, e.type as type, e.file_path as file_path,
+               e.line_number as line_number, 0 as usage_count
+        ORDER BY e.file_path, e.line_number
+    """
+    IS_USED_QUERY = """
+        UNWIND $rows AS row
+        MATCH (e:CodeElement {project: $project, id: row.id})
+        SET e.is_used = row.is_used
+    """
+    SUMMARIES_QUERY = """
+        UNWIND $rows AS row
+        MERGE (s:UsageSummary {project: $project, scope_kind: row.scope_kind,
+                               scope: row.scope, type: row.type})
+        SET s.total = row.total, s.used = row.used, s.unused = row.total - row.used
+        WITH s WHERE s.total = 0
+        DELETE s
+    """
+
+    SCHEMA_STATEMENTS = (
+        # Superseded by the project-scoped versions below
+        "DROP CONSTRAINT code_element_id IF EXISTS",
+        "DROP CONSTRAINT file_path IF EXISTS",
+        "DROP INDEX code_element_file_path IF EXISTS",
+        """
+            CREATE CONSTRAINT code_element_project_id IF NOT EXISTS
+            FOR (e:CodeElement) REQUIRE (e.project, e.id) IS UNIQUE
+        """,
+        """
+            CREATE INDEX code_element_project IF NOT EXISTS
+            FOR (e:CodeElement) ON (e.project)
+        """,
+        """
+            CREATE INDEX code_element_project_file_path IF NOT EXISTS
+            FOR (e:CodeElement) ON (e.project, e.file_path)
+        """,
+        """
+            CREATE CONSTRAINT file_project_path IF NOT EXISTS
+            FOR (f:File) REQUIRE (f.project, f.path) IS UNIQUE
+        """,
+        """
+            CREATE CONSTRAINT usage_summary_project_scope IF NOT EXISTS
+            FOR (s:UsageSummary) REQUIRE (s.project, s.scope_kind, s.scope, s.type) IS UNIQUE
+        """,
+        """
+            CREATE CONSTRAINT module_project_path IF NOT EXISTS
+            FOR (m:Module) REQUIRE (m.project, m.path) IS UNIQUE
+        """,
+        # Seeks for the unscoped dead code and unused import queries
+        """
+            CREATE INDEX code_element_project_is_used IF NOT EXISTS
+            FOR (e:CodeElement) ON (e.project, e.is_used, e.type)
+        """,
+        """
+            CREATE INDEX code_element_project_type IF NOT EXISTS
+            FOR (e:CodeElement) ON (e.project, e.type)
+        """,
+    )
+
+    def __init__(self, neo4j_uri: str, neo4j_user: str, neo4j_password: str,
+                 batch_size: int = DEFAULT_BATCH_SIZE, project: str = DEFAULT_PROJECT):
+        if GraphDatabase is None:
+            raise RuntimeError("The neo4j package is required for the Neo4j backend "
+                               "(pip install -r requirements.txt)")
+        self.driver = GraphDatabase.driver(neo4j_uri, auth=(neo4j_user, neo4j_password))
+        self.uri = neo4j_uri
+        self.auth = (neo4j_user, neo4j_password)
+        self.batch_size = batch_size
+        self.project = project
+
+    def async_driver(self):
+        """A neo4j AsyncDriver for the same database, owned by the caller"""
+        return AsyncGraphDatabase.driver(self.uri, auth=self.auth)
+
+    def close(self):
+        self.driver.close()
+
+    def clear(self):
+        """Delete this project's nodes in bounded transactions, leaving other projects intact"""
         with self.driver.session() as session:
-            for element in self.code_elements.values():
-                if element.used_by:
-                    for usage_location in element.used_by:
-                        file_path, line_num = usage_location.rsplit(':', 1)
-                        
-                        for key, potential_user in self.code_elements.items():
-                            if (potential_user.file_path == file_path and 
-                                potential_user.line_number < int(line_num)):
-                                
-                                session.run("""
-                                    MATCH (user:CodeElement {id: $user_id})
-                                    MATCH (used:CodeElement {id: $used_id})
-                                    CREATE (user)-[:USES {line_number: $line_number}]->(used)
-                                """,
-                                user_id=f"{potential_user.file_path}::{potential_user.name}",
-                                used_id=f"{element.file_path}::{element.name}",
-                                line_number=int(line_num)
-                                )
-                                break
-                                
-        logger.info("Created usage relationships")
-        
-    def find_dead_code(self) -> List[CodeElement]:
+            # CALL ... IN TRANSACTIONS only runs in an auto-commit transaction
+            for label in ('CodeElement', 'File', 'Module', 'UsageSummary'):
+                session.run(f"""
+                    MATCH (n:{label} {{project: $project}})
+                    CALL {{ WITH n DETACH DELETE n }} IN TRANSACTIONS OF $chunk ROWS
+                """, project=self.project, chunk=self.batch_size).consume()
+                self.profiler.count('cypher_statements')
+        logger.info(f"Cleared existing Neo4j data for project '{self.project}'")
+
+    def create_schema(self):
+        """Create the constraints and indexes backing id and per-file lookups"""
+        with self.driver.session() as session:
+            for statement in self.SCHEMA_STATEMENTS:
+                session.run(statement)
+                self.profiler.count('cypher_statements')
+        logger.info("Ensured Neo4j constraints and indexes")
+
+    def _write_batches(self, query: str, rows: Iterable) -> int:
+        count = 0
+        with self.driver.session() as session:
+            for batch in batched(rows, self.batch_size):
+                session.execute_write(self._run_batch, query, batch, self.project)
+                count += len(batch)
+                self.profiler.count('cypher_statements')
+                self.profiler.count('rows_written', len(batch))
+        return count
+
+    @staticmethod
+    def _run_batch(tx, query: str, rows: List[dict], project: str):
+        tx.run(query, rows=rows, project=project)
+
+    @staticmethod
+    def node_row(element: CodeElement) -> dict:
+        return {
+            'name': element.name,
+            'type': element.type,
+            'file_path': element.file_path,
+            'line_number': element.line_number,
+            'is_used': element.is_used,
+            'id': element.key
+        }
+
+    @staticmethod
+    def file_row(path: str, content_hash: str) -> dict:
+        return {'path': path, 'content_hash': content_hash, 'directory': os.path.dirname(path)}
+
+    @staticmethod
+    def module_row(module: Tuple[str, Optional[str]]) -> dict:
+        path, parent = module
+        return {'path': path, 'name': os.path.basename(path) or path, 'parent': parent}
+
+    @staticmethod
+    def relationship_row(edge: Tuple[str, str, Tuple[int, ...]]) -> dict:
+        user_key, used_key, lines = edge
+        return {'user_id': user_key, 'used_id': used_key, 'lines': list(lines)}
+
+    def write_nodes(self, elements: Iterable[CodeElement]) -> int:
+        return self._write_batches(self.NODES_QUERY, map(self.node_row, elements))
+
+    def write_relationships(self, edges: Iterable[Tuple[str, str, Tuple[int, ...]]]) -> int:
+        return self._write_batches(self.RELATIONSHIPS_QUERY, map(self.relationship_row, edges))
+
+    def write_files(self, file_hashes: Iterable[Tuple[str, str]]) -> None:
+        rows = (self.file_row(path, content_hash) for path, content_hash in file_hashes)
+        self._write_batches(self.FILES_QUERY, rows)
+
+    def write_modules(self, modules: Iterable[Tuple[str, Optional[str]]]) -> None:
+        self._write_batches(self.MODULES_QUERY, map(self.module_row, modules))
+
+    def stored_file_hashes(self) -> Dict[str, str]:
+        with self.driver.session() as session:
+            result = session.run("""
+                MATCH (f:File {project: $project})
+                RETURN f.path AS path, f.content_hash AS content_hash
+            """, project=self.project)
+            self.profiler.count('cypher_statements')
+            return {record['path']: record['content_hash'] for record in result}
+
+    def delete_files(self, file_paths: Iterable[str]) -> None:
+        deleted = False
+        with self.driver.session() as session:
+            for batch in batched(file_paths, self.batch_size):
+                session.execute_write(self._delete_files, batch, self.project)
+                self.profiler.count('cypher_statements', 2)
+                deleted = True
+            # Modules emptied by the deletion, innermost first
+            while deleted:
+                deleted = session.execute_write(self._delete_empty_modules, self.project)
+                self.profiler.count('cypher_statements')
+
+    @staticmethod
+    def _delete_empty_modules(tx, project: str) -> int:
+        result = tx.run("""
+            MATCH (m:Module {project: $project})
+            WHERE NOT (m)-[:CONTAINS]->()
+            DETACH DELETE m
+            RETURN count(*) AS deleted
+        """, project=project)
+        return result.single()['deleted']
+
+    @staticmethod
+    def _delete_files(tx, paths: List[str], project: str):
+        tx.run("""
+            UNWIND $paths AS path
+            MATCH (e:CodeElement {project: $project, file_path: path})
+            DETACH DELETE e
+        """, paths=paths, project=project)
+        tx.run("""
+            UNWIND $paths AS path
+            MATCH (f:File {project: $project, path: path})
+            DETACH DELETE f
+        """, paths=paths, project=project)
+
+    def stored_is_used(self) -> Iterator[Tuple[str, bool]]:
         with self.driver.session() as session:
             result = session.run("""
-                MATCH (e:CodeElement)
-                WHERE e.is_used = false 
-                AND e.type IN ['function', 'class']
-                AND NOT e.name STARTS WITH '_'
-                AND NOT e.name IN ['main', '__init__']
-                RETURN e.name as name, e.type as type, e.file_path as file_path, 
-                       e.line_number as line_number
-                ORDER BY e.file_path, e.line_number
-            """)
-            
-            dead_code = []
+                MATCH (e:CodeElement {project: $project})
+                RETURN e.id AS id, e.is_used AS is_used
+            """, project=self.project)
+            self.profiler.count('cypher_statements')
+            for record in result:
+                yield record['id'], record['is_used']
+
+    def update_is_used(self, rows: Iterable[Tuple[str, bool]]) -> None:
+        rows = ({'id': key, 'is_used': is_used} for key, is_used in rows)
+        self._write_batches(self.IS_USED_QUERY, rows)
+
+    def iter_dead_code(self, path: str = '') -> Iterator[Tuple[CodeElement, int]]:
+        """Records are streamed from the result cursor, fetch_size at a time"""
+        if path:
+            # Seek the scope's File or Module, then follow DEFINES
+            query = self.SCOPE_FILES + """
+                MATCH (f)-[:DEFINES]->(e:CodeElement {is_used: false})
+            """ + self.DEAD_CODE_FILTER
+        else:
+            # Seek on the (project, is_used, type) index
+            query = """
+                MATCH (e:CodeElement {project: $project, is_used: false})
+            """ + self.DEAD_CODE_FILTER
+        with self.driver.session(fetch_size=self.batch_size) as session:
+            result = session.run(query, project=self.project, path=scope_path(path))
+            self.profiler.count('cypher_statements')
+            
             for record in result:
-                dead_code.append(CodeElement(
+                yield CodeElement(
                     name=record['name'],
                     type=record['type'],
                     file_path=record['file_path'],
                     line_number=record['line_number'],
                     is_used=False
-                ))
-                
-        return dead_code
-        
-    def get_usage_statistics(self) -> Dict[str, int]:
+                ), record['usage_count']
+
+    def iter_unused_imports(self, path: str = '') -> Iterator[CodeElement]:
+        if path:
+            query = self.SCOPE_FILES + """
+                MATCH (f)-[:IMPORTS]->(e:CodeElement {is_used: false})
+            """
+        else:
+            query = """
+                MATCH (e:CodeElement {project: $project, is_used: false, type: 'import'})
+            """
+        query += """
+            RETURN e.name as name, e.file_path as file_path, e.line_number as line_number
+            ORDER BY e.file_path, e.line_number
+        """
+        with self.driver.session(fetch_size=self.batch_size) as session:
+            result = session.run(query, project=self.project, path=scope_path(path))
+            self.profiler.count('cypher_statements')
+            
+            for record in result:
+                yield CodeElement(
+                    name=record['name'],
+                    type='import',
+                    file_path=record['file_path'],
+                    line_number=record['line_number'],
+                    is_used=False
+                )
+
+    def iter_most_used(self, limit: int = DEFAULT_MOST_USED) -> Iterator[Tuple[CodeElement, int]]:
+        with self.driver.session() as session:
+            # One edge per pair, so this sums counts instead of counting references
+            result = session.run("""
+                MATCH (e:CodeElement {project: $project})<-[u:USES]-()
+                WHERE e.type <> 'import'
+                WITH e, sum(u.count) as usage_count
+                ORDER BY usage_count DESC, e.file_path, e.line_number
+                LIMIT $limit
+                RETURN e.name as name, e.type as type, e.file_path as file_path,
+                       e.line_number as line_number, usage_count
+            """, project=self.project, limit=limit)
+            self.profiler.count('cypher_statements')
+            
+            for record in result:
+                yield CodeElement(
+                    name=record['name'],
+                    type=record['type'],
+                    file_path=record['file_path'],
+                    line_number=record['line_number'],
+                    is_used=True
+                ), record['usage_count']
+
+    def write_statistics(self, rows: Iterable[Tuple[str, str, str, int, int]],
+                         replace: bool = False) -> None:
+        if replace:
+            with self.driver.session() as session:
+                session.run("""
+                    MATCH (s:UsageSummary {project: $project})
+                    CALL { WITH s DELETE s } IN TRANSACTIONS OF $chunk ROWS
+                """, project=self.project, chunk=self.batch_size).consume()
+                self.profiler.count('cypher_statements')
+        self._write_batches(self.SUMMARIES_QUERY, (
+            {'scope_kind': kind, 'scope': scope, 'type': code_type, 'total': total, 'used': used}
+            for kind, scope, code_type, total, used in rows))
+
+    def get_usage_statistics(self, kind: str = 'project',
+                             scope: str = '') -> Dict[str, Dict[str, int]]:
         with self.driver.session() as session:
+            # One lookup on the summary constraint instead of aggregating every node
             result = session.run("""
-                MATCH (e:CodeElement)
-                RETURN e.type as type, 
-                       COUNT(e) as total,
-                       SUM(CASE WHEN e.is_used THEN 1 ELSE 0 END) as used,
-                       SUM(CASE WHEN e.is_used THEN 0 ELSE 1 END) as unused
-            """)
+                MATCH (s:UsageSummary {project: $project, scope_kind: $kind, scope: $scope})
+                RETURN s.type as type, s.total as total, s.used as used, s.unused as unused
+            """, project=self.project, kind=kind, scope=scope)
+            self.profiler.count('cypher_statements')
             
             stats = {}
             for record in result:
@@ -253,27 +1949,1305 @@ class Neo4jDeadCodeDetector:
                 }
                 
         return stats
+
+class DeadCodeDetector:
+    """Analyzes a directory and stores the resulting graph in a GraphBackend"""
+    
+    def __init__(self, backend: GraphBackend, jobs: int = 1,
+                 cache: Optional[AnalysisCache] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 profiler: Optional[Profiler] = None, limits: Optional[ResourceLimits] = None,
+                 exclude: Iterable[str] = ()):
+        self.backend = backend
+        self.profiler = profiler or NULL_PROFILER
+        backend.profiler = self.profiler
+        self.jobs = jobs
+        self.batch_size = batch_size
+        self.cache = cache
+        self.limits = limits or ResourceLimits()
+        # --exclude globs, on top of EXCLUDED_DIRS
+        self.exclude = tuple(exclude)
+        # Top of the module hierarchy; set by build_graph
+        self.root_path: Optional[str] = None
+        # Resolved usages per file and files per usage name, kept only for --watch
+        self.file_usages: Optional[Dict[str, List[Tuple[str, int]]]] = None
+        self.reset_analysis()
         
-    def run_analysis(self, directory_path: str):
-        """Run complete dead code analysis"""
-        logger.info("Starting dead code analysis...")
+    def reset_analysis(self) -> None:
+        """Forget the in-memory analysis so the directory can be analyzed afresh"""
+        self.code_elements: Dict[str, CodeElement] = {}
+        self.symbols = SymbolIndex()
+        self.file_hashes: Dict[str, str] = {}
+        # Unresolved usages as parallel arrays: name, file id, line
+        self.pending_names: List[str] = []
+        self.pending_files = array('l')
+        self.pending_lines = array('l')
+        self.main_blocks: Dict[str, List[Tuple[int, int]]] = {}
+        self.exports: Dict[str, List[str]] = {}
+        if self.file_usages is not None:
+            self.file_usages = {}
+        self.usage_files: Dict[str, Set[str]] = defaultdict(set)
+        self.file_keys: Optional[Dict[str, List[str]]] = None
+        self.statistics = UsageStatistics(self.root_path)
+        self.skipped: Dict[str, SkippedFile] = {}
         
-        self.clear_database()
+    def set_root(self, directory_path: str) -> None:
+        """Make the analyzed directory the top of the module hierarchy and of the
+        directory statistics; call before analyzing"""
+        self.root_path = directory_path
+        self.statistics.root = scope_path(directory_path)
+        
+    def keep_usages(self) -> None:
+        """Retain resolved usages so update_files can re-resolve them; call before analyzing"""
+        self.file_usages = {}
+        
+    def enable_profiling(self, top_files: int = DEFAULT_PROFILE_TOP_FILES) -> Profiler:
+        """Start collecting phase timings and counters; see profile_report"""
+        self.profiler = Profiler(top_files)
+        self.backend.profiler = self.profiler
+        return self.profiler
+        
+    def profile_report(self) -> dict:
+        """Timings and counters collected so far (empty unless profiling is enabled)"""
+        return self.profiler.report()
+        
+    def close(self):
+        self.backend.close()
+        
+    def clear_database(self):
+        with self.profiler.phase('clear'):
+            self.backend.clear()
+            
+    def create_schema(self):
+        with self.profiler.phase('create_schema'):
+            self.backend.create_schema()
+            
+    def iter_analyses(self, directory_path: str,
+                      shard: Optional[Tuple[int, int]] = None) -> Iterator[FileAnalysis]:
+        """Walk and parse a directory (or one (index, count) shard of it), yielding
+        per-file results in walk order"""
+        def walk():
+            if shard is None:
+                file_paths = iter_python_files(directory_path, self.exclude)
+            else:
+                file_paths = iter_shard_files(directory_path, *shard, exclude=self.exclude)
+            for file_path in file_paths:
+                # Assign file ids in walk order, not worker completion order
+                FILE_TABLE.intern(file_path)
+                yield file_path
+                
+        if self.jobs > 1 or self.limits.needs_workers:
+            # In submission order: deterministic merge
+            yield from self._parsed(parse_in_workers(walk(), self.jobs, self.cache, self.limits))
+        else:
+            yield from self._parsed(timed_parse_file(file_path, self.cache, self.limits)
+                                    for file_path in walk())
+                    
+        if self.cache is not None:
+            self.cache.prune()
+        if self.skipped:
+            reasons = Counter(skipped.reason for skipped in self.skipped.values())
+            logger.warning(f"Skipped {len(self.skipped)} files: "
+                           f"{', '.join(f'{n} {reason}' for reason, n in sorted(reasons.items()))}")
+            
+    def _parsed(self, results: Iterable[ParseResult]) -> Iterator[FileAnalysis]:
+        for file_path, seconds, analysis, skip in results:
+            self.profiler.record_file(file_path, seconds)
+            self.skipped.pop(file_path, None)
+            if analysis is not None:
+                yield analysis
+            else:
+                self.skipped[file_path] = SkippedFile(file_path, *skip, seconds)
+                self.profiler.count('files_skipped')
+                
+    def skip_report(self) -> List[dict]:
+        """Files left out of the analysis with the reason, detail and time spent, by path"""
+        return [skipped._asdict() for _, skipped in sorted(self.skipped.items())]
+                
+    def analyze_directory(self, directory_path: str) -> None:
+        logger.info(f"Analyzing directory: {directory_path}")
+        
+        with self.profiler.phase('parse'):
+            for analysis in self.iter_analyses(directory_path):
+                self.merge_analysis(analysis)
+                    
+        self.resolve_usages()
+        
+    def write_shard(self, directory_path: str, output_path: str,
+                    shard: Tuple[int, int]) -> int:
+        """Analyze one shard of a directory and save its unresolved partial results.
+
+        The file holds a header followed by one pickled FileAnalysis per file
+        (definitions plus unresolved usages), written as they are parsed.
+        load_shards merges the shards of all indexes into a full analysis.
+        """
+        index, count = shard
+        logger.info(f"Analyzing shard {index + 1}/{count} of {directory_path}")
+        tmp_path = f"{output_path}.{os.getpid()}.tmp"
+        files = 0
+        with open(tmp_path, 'wb') as f:
+            pickle.dump({'format': SHARD_FORMAT, 'analyzer_version': ANALYZER_VERSION,
+                         'directory': directory_path, 'shard': shard}, f)
+            for analysis in self.iter_analyses(directory_path, shard):
+                pickle.dump(analysis, f, protocol=pickle.HIGHEST_PROTOCOL)
+                files += 1
+        os.replace(tmp_path, output_path)
+        logger.info(f"Wrote {files} file analyses to shard {output_path}")
+        return files
+        
+    @staticmethod
+    def read_shard_header(shard_path: str) -> dict:
+        """The header write_shard put in front of a shard file"""
+        with open(shard_path, 'rb') as f:
+            try:
+                header = pickle.load(f)
+            except (pickle.UnpicklingError, EOFError):
+                header = None
+        if not isinstance(header, dict) or header.get('format') != SHARD_FORMAT:
+            raise ValueError(f"{shard_path} is not a deadcode shard")
+        if header['analyzer_version'] != ANALYZER_VERSION:
+            raise ValueError(f"{shard_path} was written by analyzer version "
+                             f"{header['analyzer_version']}, expected {ANALYZER_VERSION}")
+        return header
+        
+    def check_shards(self, shard_paths: List[str], allow_partial: bool = False) -> None:
+        """Require shards of one directory and one shard count, each index exactly once.
+
+        A missing shard would make code only it uses look dead, so it is an
+        error unless ``allow_partial``.
+        """
+        if not shard_paths:
+            raise ValueError("no shards given")
+        headers = [(shard_path, self.read_shard_header(shard_path)) for shard_path in shard_paths]
+        directories = {scope_path(header['directory']) for _, header in headers}
+        if len(directories) > 1:
+            raise ValueError(f"shards come from different directories: "
+                             f"{', '.join(sorted(directories))}")
+        counts = {header['shard'][1] for _, header in headers}
+        if len(counts) > 1:
+            raise ValueError(f"shards were split into different counts: "
+                             f"{', '.join(map(str, sorted(counts)))}")
+        count = counts.pop()
+        loaded: Dict[int, str] = {}
+        for shard_path, header in headers:
+            index = header['shard'][0]
+            if index in loaded:
+                raise ValueError(f"shard {index + 1}/{count} given twice: "
+                                 f"{loaded[index]} and {shard_path}")
+            loaded[index] = shard_path
+        missing = [str(index + 1) for index in range(count) if index not in loaded]
+        if missing:
+            message = f"missing shards {', '.join(missing)} of {count}"
+            if not allow_partial:
+                raise ValueError(f"{message}; pass every shard or allow a partial merge")
+            logger.warning(f"{message}: code only they use is reported as dead")
+            
+    def load_shards(self, shard_paths: Iterable[str], allow_partial: bool = False) -> None:
+        """Merge shards written by write_shard and resolve usages across all of them"""
+        shard_paths = list(shard_paths)
+        self.check_shards(shard_paths, allow_partial)
+        seen: Dict[str, str] = {}
+        for shard_path in shard_paths:
+            with open(shard_path, 'rb') as f:
+                pickle.load(f)
+                files = 0
+                while True:
+                    try:
+                        analysis = pickle.load(f)
+                    except EOFError:
+                        break
+                    if analysis.file_path in seen:
+                        logger.warning(f"Skipping {analysis.file_path} from {shard_path}: "
+                                       f"already loaded from {seen[analysis.file_path]}")
+                        continue
+                    seen[analysis.file_path] = shard_path
+                    self.merge_analysis(analysis)
+                    files += 1
+            logger.info(f"Loaded {files} file analyses from shard {shard_path}")
+            
+        self.resolve_usages()
+        
+    def analyze_file(self, file_path: str) -> None:
+        analysis = parse_file(file_path, self.cache)
+        if analysis is not None:
+            self.merge_analysis(analysis)
+            
+    def merge_analysis(self, analysis: FileAnalysis) -> None:
+        self.file_hashes[analysis.file_path] = analysis.content_hash
+        if analysis.main_blocks:
+            self.main_blocks[analysis.file_path] = analysis.main_blocks
+        if analysis.exports:
+            self.exports[analysis.file_path] = analysis.exports
+        
+        for element in analysis.definitions + analysis.imports:
+            self.add_element(element)
+            
+        file_id = FILE_TABLE.intern(analysis.file_path)
+        for usage_name, line_num in analysis.usages:
+            self.pending_names.append(sys.intern(usage_name))
+            self.pending_files.append(file_id)
+            self.pending_lines.append(line_num)
+            
+        logger.info(f"Analyzed: {analysis.file_path}")
+            
+    def add_element(self, element: CodeElement) -> None:
+        key = element.key
+        previous = self.code_elements.get(key)
+        if previous is None:
+            self.symbols.add(key, element.name)
+        else:
+            self.statistics.remove(previous)
+        self.code_elements[key] = element
+        self.statistics.add(element)
+        
+    def resolve_usages(self) -> None:
+        """Resolve collected usages once every definition is known"""
+        with self.profiler.phase('resolve_usages'):
+            for usage_name, file_id, line_num in zip(self.pending_names, self.pending_files,
+                                                      self.pending_lines):
+                self.mark_as_used(usage_name, FILE_TABLE.path(file_id), line_num)
+            self.profiler.count('usages', len(self.pending_names))
+        if self.file_usages is not None:
+            for usage_name, file_id, line_num in zip(self.pending_names, self.pending_files,
+                                                      self.pending_lines):
+                file_path = FILE_TABLE.path(file_id)
+                self.file_usages.setdefault(file_path, []).append((usage_name, line_num))
+                self.usage_files[usage_name].add(file_path)
+        logger.info(f"Resolved {len(self.pending_names)} usages")
+        self.pending_names = []
+        self.pending_files = array('l')
+        self.pending_lines = array('l')
+        
+    def mark_as_used(self, usage_name: str, file_path: str, line_num: int):
+        file_id = FILE_TABLE.intern(file_path)
+        current_file_key = f"{file_path}::{usage_name}"
+        if current_file_key in self.code_elements:
+            element = self.code_elements[current_file_key]
+            if not element.is_used:
+                element.is_used = True
+                self.statistics.mark_used(element)
+            element.add_usage(file_id, line_num)
+            return
+            
+        for key in self.symbols.lookup(usage_name):
+            element = self.code_elements[key]
+            if not element.is_used:
+                element.is_used = True
+                self.statistics.mark_used(element)
+            element.add_usage(file_id, line_num)
+                
+    def usage_targets(self, usage_name: str, file_path: str) -> List[str]:
+        """Keys mark_as_used marks for a usage under the current definitions"""
+        current_file_key = f"{file_path}::{usage_name}"
+        if current_file_key in self.code_elements:
+            return [current_file_key]
+        return self.symbols.lookup(usage_name)
+        
+    def forget_usages(self, file_path: str) -> List[Tuple[str, int]]:
+        usages = self.file_usages.pop(file_path, [])
+        for usage_name, _ in usages:
+            files = self.usage_files.get(usage_name)
+            if files is not None:
+                files.discard(file_path)
+                if not files:
+                    del self.usage_files[usage_name]
+        return usages
+        
+    def update_files(self, file_paths: Iterable[str]) -> FileUpdate:
+        """Re-analyze added, changed or removed files against the in-memory analysis.
+
+        Only usages that may resolve differently are re-resolved: those in the
+        updated files, and those in other files whose name matches a definition
+        that was added or removed. Files that fail to parse keep their last good
+        analysis.
+        """
+        analyses: Dict[str, FileAnalysis] = {}
+        removed = set()
+        for file_path in set(file_paths):
+            if os.path.isfile(file_path):
+                for analysis in self._parsed([timed_parse_file(file_path, self.cache,
+                                                               self.limits)]):
+                    analyses[file_path] = analysis
+            else:
+                self.skipped.pop(file_path, None)
+                if file_path in self.file_hashes:
+                    removed.add(file_path)
+        return self.apply_file_analyses(analyses, removed)
+        
+    def apply_file_analyses(self, analyses: Dict[str, FileAnalysis],
+                            removed: Iterable[str] = ()) -> FileUpdate:
+        """Replace the analysis of some files and drop others; see update_files"""
+        if self.file_usages is None:
+            raise RuntimeError("updating files needs keep_usages() before the initial analysis")
+        if self.file_keys is None:
+            self.file_keys = defaultdict(list)
+            for key, element in self.code_elements.items():
+                self.file_keys[element.file_path].append(key)
+                
+        analyses = {file_path: analysis for file_path, analysis in analyses.items()
+                    if self.file_hashes.get(file_path) != analysis.content_hash}
+        removed = {file_path for file_path in removed if file_path in self.file_hashes}
+        dirty = set(analyses) | removed
+        if not dirty:
+            return FileUpdate(set(), set(), set(), set())
+            
+        names = set()
+        for file_path in dirty:
+            for key in self.file_keys.get(file_path, ()):
+                names.add(self.code_elements[key].name)
+        for analysis in analyses.values():
+            names.update(element.name for element in analysis.definitions + analysis.imports)
+        affected = set(dirty)
+        for name in names:
+            for lookup_name in [name] + SymbolIndex.suffixes(name):
+                affected.update(self.usage_files.get(lookup_name, ()))
+                
+        # Whole files are re-resolved, so every location they contributed can go
+        stale: Dict[str, Set[int]] = defaultdict(set)
+        for file_path in affected:
+            file_id = FILE_TABLE.intern(file_path)
+            for usage_name, line_num in self.file_usages.get(file_path, ()):
+                for key in self.usage_targets(usage_name, file_path):
+                    stale[key].add(file_id << 32 | line_num)
+        for key, locations in stale.items():
+            element = self.code_elements[key]
+            element.used_by = array('q', (location for location in element.used_by or ()
+                                          if location not in locations)) or None
+            if element.is_used and element.used_by is None:
+                element.is_used = False
+                self.statistics.mark_unused(element)
+            
+        for file_path in dirty:
+            for key in self.file_keys.pop(file_path, ()):
+                element = self.code_elements.pop(key)
+                self.symbols.remove(key, element.name)
+                self.statistics.remove(element)
+            self.file_hashes.pop(file_path, None)
+            self.main_blocks.pop(file_path, None)
+            self.exports.pop(file_path, None)
+            self.forget_usages(file_path)
+            
+        for file_path, analysis in analyses.items():
+            self.merge_analysis(analysis)
+            self.file_keys[file_path] = list(dict.fromkeys(
+                element.key for element in analysis.definitions + analysis.imports))
+        for file_path in affected - dirty:
+            file_id = FILE_TABLE.intern(file_path)
+            for usage_name, line_num in self.forget_usages(file_path):
+                self.pending_names.append(usage_name)
+                self.pending_files.append(file_id)
+                self.pending_lines.append(line_num)
+        self.resolve_usages()
+        
+        touched = set(stale)
+        for file_path in affected:
+            for usage_name, _ in self.file_usages.get(file_path, ()):
+                touched.update(self.usage_targets(usage_name, file_path))
+        logger.info(f"Re-analyzed {len(analyses)} changed and {len(removed)} removed files, "
+                    f"re-resolved usages in {len(affected)} files")
+        return FileUpdate(set(analyses), removed, affected, touched)
+        
+    def sync_update(self, update: FileUpdate) -> None:
+        """Write one update_files result to the backend.
+
+        Like sync_graph, but edges and is_used flags come from the files and
+        elements the update touched instead of a pass over the whole graph.
+        """
+        with self.profiler.phase('sync_update'):
+            changed = update.changed
+            self.backend.delete_files(sorted(update.changed | update.removed))
+            self.create_file_nodes(sorted(changed))
+            self.create_graph_nodes(self.code_elements[key] for file_path in changed
+                                    for key in self.file_keys.get(file_path, ()))
+            
+            # Edges into or out of changed files all come from usages in affected files
+            scopes = ScopeIndex({key: self.code_elements[key] for file_path in update.affected
+                                 for key in self.file_keys.get(file_path, ())})
+            edges: Dict[Tuple[str, str], List[int]] = defaultdict(list)
+            for file_path in update.affected:
+                file_id = FILE_TABLE.intern(file_path)
+                for usage_name, line_num in self.file_usages.get(file_path, ()):
+                    for used_key in self.usage_targets(usage_name, file_path):
+                        if file_path in changed or self.code_elements[used_key].file_path in changed:
+                            user_key = scopes.enclosing(file_id, line_num)
+                            if user_key is not None:
+                                edges[user_key, used_key].append(line_num)
+            self.create_usage_relationships((user_key, used_key, tuple(sorted(lines)))
+                                            for (user_key, used_key), lines
+                                            in sorted(edges.items()))
+            
+            self.backend.update_is_used(
+                (key, self.code_elements[key].is_used) for key in sorted(update.touched)
+                if key in self.code_elements and self.code_elements[key].file_path not in changed)
+            self.create_statistics_nodes()
         
+    def dead_code_since(self, directory_path: str, rev: str,
+                        root_kinds: Optional[Iterable[str]] = None,
+                        root_patterns: Iterable[str] = ()
+                        ) -> Tuple[List[CodeElement], List[CodeElement]]:
+        """Dead code introduced and removed since a git revision.
+
+        The current tree is analyzed (unchanged files come from the analysis
+        cache), then the files git reports as changed are swapped for their
+        content at ``rev`` and only the affected usages re-resolved. With
+        ``root_kinds`` reachability decides what is dead. Returns the newly
+        dead and the newly live elements at their current locations.
+        """
+        def dead_keys() -> Set[str]:
+            if root_kinds is not None:
+                return {element.key for element in
+                        self.find_unreachable_code(root_kinds, root_patterns)}
+            return {key for key, element in self.code_elements.items()
+                    if not element.is_used and is_dead_code_candidate(element)}
+            
+        changed = git_changed_files(directory_path, rev, self.exclude)
+        logger.info(f"{len(changed)} Python files changed since {rev}")
+        if self.file_usages is None:
+            self.keep_usages()
         self.analyze_directory(directory_path)
         
-        self.create_graph_nodes()
-        self.create_usage_relationships()
+        dead_after = dead_keys()
+        current = {key: CodeElement(element.name, element.type, element.file_path,
+                                    element.line_number)
+                   for key, element in self.code_elements.items()
+                   if is_dead_code_candidate(element)}
+                   
+        analyses: Dict[str, FileAnalysis] = {}
+        removed = set()
+        for file_path in changed:
+            content = git_file_content(directory_path, rev, file_path)
+            if content is None:
+                removed.add(file_path)
+                continue
+            if self.limits.max_file_size and len(content) > self.limits.max_file_size:
+                logger.warning(f"Keeping the current analysis of {file_path}: "
+                               f"it is over the size limit at {rev}")
+                continue
+            try:
+                analyses[file_path] = analyze_source(file_path, content)
+            except Exception as e:
+                logger.warning(f"Keeping the current analysis of {file_path}: "
+                               f"cannot analyze it at {rev}: {e}")
+        self.apply_file_analyses(analyses, removed)
+        dead_before = dead_keys()
+        
+        def located(keys: Iterable[str]) -> List[CodeElement]:
+            elements = [current[key] for key in keys if key in current]
+            elements.sort(key=lambda element: (element.file_path, element.line_number))
+            return elements
+        return located(dead_after - dead_before), located(dead_before - dead_after)
+        
+    def watch(self, directory_path: str, poll_interval: float = DEFAULT_POLL_INTERVAL,
+              lock=None) -> Iterator[FileUpdate]:
+        """Keep the analysis and stored graph current as files change.
+
+        Needs keep_usages() before the initial analysis. Yields each update
+        once it has been written to the backend; ``lock`` is held while the
+        analysis is being modified.
+        """
+        watcher = make_watcher(directory_path, poll_interval)
+        try:
+            while True:
+                file_paths = watcher.wait()
+                if self.exclude:
+                    file_paths = {file_path for file_path in file_paths if not is_excluded(
+                        os.path.relpath(file_path, directory_path).replace(os.sep, '/'),
+                        self.exclude)}
+                start = time.perf_counter()
+                with lock or nullcontext():
+                    update = self.update_files(file_paths)
+                    if not update.changed and not update.removed:
+                        continue
+                    self.sync_update(update)
+                logger.info(f"Updated analysis in {(time.perf_counter() - start) * 1000:.0f} ms")
+                yield update
+        finally:
+            watcher.close()
+            
+    def create_graph_nodes(self, elements: Optional[Iterable[CodeElement]] = None):
+        if elements is None:
+            elements = self.code_elements.values()
+            
+        start = time.perf_counter()
+        with self.profiler.phase('create_graph_nodes'):
+            count = self.backend.write_nodes(elements)
+        elapsed = time.perf_counter() - start
+                
+        rate = count / elapsed if elapsed > 0 else float(count)
+        logger.info(f"Created {count} graph nodes for code elements ({rate:.0f} rows/sec)")
+        
+    def usage_sites(self) -> Iterator[Tuple[Optional[str], str, str, int]]:
+        """Yield (user_key, used_key, file_path, line) for every resolved usage.
+
+        user_key is the enclosing function or class, or None at module level.
+        """
+        scopes = ScopeIndex(self.code_elements)
+        for used_key, element in self.code_elements.items():
+            for file_id, line_num in element.usage_locations():
+                yield scopes.enclosing(file_id, line_num), used_key, FILE_TABLE.path(file_id), line_num
+                
+    def usage_edges(self) -> Iterator[Tuple[str, str, Tuple[int, ...]]]:
+        """Yield (user_key, used_key, lines) once per definition and what it uses, with
+        the sorted line of every reference inside the definition"""
+        scopes = ScopeIndex(self.code_elements)
+        for used_key, element in self.code_elements.items():
+            users: Dict[str, List[int]] = {}
+            for file_id, line_num in element.usage_locations():
+                user_key = scopes.enclosing(file_id, line_num)
+                if user_key is not None:
+                    users.setdefault(user_key, []).append(line_num)
+            for user_key, lines in users.items():
+                yield user_key, used_key, tuple(lines)
+                
+    def reachability_roots(self, root_kinds: Iterable[str] = DEFAULT_ROOT_KINDS,
+                           root_patterns: Iterable[str] = ()) -> Set[str]:
+        """Keys of the definitions reachability analysis starts from"""
+        root_kinds = set(root_kinds)
+        root_patterns = list(root_patterns)
+        roots = set()
+        
+        for key, element in self.code_elements.items():
+            if element.type == 'import':
+                continue
+            short_name = element.name.rsplit('.', 1)[-1]
+            if 'main' in root_kinds and element.type == 'function' and element.name == 'main':
+                roots.add(key)
+            elif 'tests' in root_kinds and (
+                    (element.type == 'function' and short_name.startswith('test'))
+                    or (element.type == 'class' and element.name.startswith('Test'))):
+                roots.add(key)
+            elif any(fnmatchcase(element.name, pattern) for pattern in root_patterns):
+                roots.add(key)
+                
+        if '__all__' in root_kinds:
+            for file_path, names in self.exports.items():
+                for name in names:
+                    key = f"{file_path}::{name}"
+                    if key in self.code_elements:
+                        roots.add(key)
+                        
+        if '__main__' in root_kinds or 'module' in root_kinds:
+            for user_key, used_key, file_path, line_num in self.usage_sites():
+                if user_key is not None:
+                    continue
+                if 'module' in root_kinds or any(
+                        start <= line_num <= end
+                        for start, end in self.main_blocks.get(file_path, ())):
+                    roots.add(used_key)
+        return roots
+        
+    def find_unreachable_code(self, root_kinds: Iterable[str] = DEFAULT_ROOT_KINDS,
+                              root_patterns: Iterable[str] = ()) -> List[CodeElement]:
+        """Definitions not transitively used from any root, ordered like find_dead_code"""
+        with self.profiler.phase('reachability'):
+            roots = self.reachability_roots(root_kinds, root_patterns)
+            graph = UsageGraph(list(self.code_elements),
+                               ((user_key, used_key) for user_key, used_key, _ in self.usage_edges()))
+            seen = graph.reachable(roots)
+        logger.info(f"Reachability: {sum(seen)} of {len(seen)} elements reachable "
+                    f"from {len(roots)} roots")
+        
+        unreachable = [
+            element for key, element in self.code_elements.items()
+            if not seen[graph.index[key]] and is_dead_code_candidate(element)
+        ]
+        unreachable.sort(key=lambda element: (element.file_path, element.line_number))
+        return unreachable
+                    
+    def create_usage_relationships(self,
+                                   edges: Optional[Iterable[Tuple[str, str, Tuple[int, ...]]]] = None):
+        if edges is None:
+            edges = self.usage_edges()
+            
+        start = time.perf_counter()
+        with self.profiler.phase('create_usage_relationships'):
+            count = self.backend.write_relationships(edges)
+        elapsed = time.perf_counter() - start
+                                
+        rate = count / elapsed if elapsed > 0 else float(count)
+        logger.info(f"Created {count} usage relationships ({rate:.0f} rows/sec)")
+        
+    def create_file_nodes(self, file_paths: Optional[Iterable[str]] = None):
+        """Record the content hash of each analyzed file for incremental syncs, and the
+        modules containing the files"""
+        file_paths = list(self.file_hashes if file_paths is None else file_paths)
+        with self.profiler.phase('create_file_nodes'):
+            self.backend.write_modules(self.module_rows(file_paths))
+            self.backend.write_files((path, self.file_hashes[path]) for path in file_paths)
+            
+    def module_rows(self, file_paths: Iterable[str]) -> List[Tuple[str, Optional[str]]]:
+        """(directory, parent) for the directories holding the files and their ancestors,
+        up to root_path (or the top of the paths without one)"""
+        root = scope_path(self.root_path) if self.root_path else None
+        modules: Dict[str, Optional[str]] = {}
+        for file_path in file_paths:
+            directory = os.path.dirname(file_path)
+            while directory and directory not in modules:
+                parent = os.path.dirname(directory)
+                if directory == root or not parent or parent == directory:
+                    parent = None
+                modules[directory] = parent
+                directory = parent
+        return sorted(modules.items())
+        
+    def sync_graph(self):
+        """Bring the stored graph in line with the current analysis.
+
+        Only nodes and USES edges of added, changed or removed files are
+        rewritten; is_used is updated elsewhere only where it flipped.
+        """
+        with self.profiler.phase('sync_graph'):
+            self._sync_graph()
+            
+    def _sync_graph(self):
+        stored_hashes = self.backend.stored_file_hashes()
+            
+        changed = {path for path, content_hash in self.file_hashes.items()
+                   if stored_hashes.get(path) != content_hash}
+        removed = set(stored_hashes) - set(self.file_hashes)
+        dirty = changed | removed
+        logger.info(f"Incremental sync: {len(changed)} added/changed, {len(removed)} removed, "
+                    f"{len(self.file_hashes) - len(changed)} unchanged files")
+        
+        self.backend.delete_files(sorted(dirty))
+        self.create_file_nodes(sorted(changed))
+        self.create_graph_nodes(element for element in self.code_elements.values()
+                                if element.file_path in changed)
+        # Edges between two unchanged files resolve the same way as before
+        self.create_usage_relationships(
+            (user_key, used_key, lines)
+            for user_key, used_key, lines in self.usage_edges()
+            if self.code_elements[user_key].file_path in changed
+            or self.code_elements[used_key].file_path in changed
+        )
+        
+        flipped = [
+            (key, self.code_elements[key].is_used)
+            for key, is_used in self.backend.stored_is_used()
+            if key in self.code_elements and self.code_elements[key].is_used != is_used
+        ]
+        self.backend.update_is_used(flipped)
+        logger.info(f"Updated is_used on {len(flipped)} unchanged nodes")
+        
+    def find_dead_code(self, path: str = '') -> List[CodeElement]:
+        """Dead code in the project, or in one file or directory (with its subtree)"""
+        with self.profiler.phase('find_dead_code'):
+            return self.backend.find_dead_code(path)
+        
+    def iter_dead_code(self, path: str = '') -> Iterator[Tuple[CodeElement, int]]:
+        """Stream (element, usage count) pairs of dead code from the backend"""
+        return self.backend.iter_dead_code(path)
+        
+    def unused_imports(self, path: str = '') -> List[CodeElement]:
+        """Imports nothing uses, in the project or in one file or directory"""
+        with self.profiler.phase('unused_imports'):
+            return list(self.backend.iter_unused_imports(path))
+        
+    def most_used(self, limit: int = DEFAULT_MOST_USED) -> List[Tuple[CodeElement, int]]:
+        """The most used definitions with their usage counts, read off the USES edges"""
+        with self.profiler.phase('most_used'):
+            return list(self.backend.iter_most_used(limit))
+        
+    def iter_unreachable_code(self, root_kinds: Iterable[str] = DEFAULT_ROOT_KINDS,
+                              root_patterns: Iterable[str] = ()
+                              ) -> Iterator[Tuple[CodeElement, int]]:
+        """Like iter_dead_code for find_unreachable_code; usages may come from other dead code"""
+        for element in self.find_unreachable_code(root_kinds, root_patterns):
+            yield element, len(element.usage_locations())
+        
+    def create_statistics_nodes(self, replace: bool = False) -> None:
+        """Persist the usage statistics as summary nodes: every scope with replace,
+        otherwise only the scopes that changed since the last call"""
+        with self.profiler.phase('create_statistics_nodes'):
+            dirty = self.statistics.take_dirty()
+            self.backend.write_statistics(self.statistics.rows(None if replace else dirty),
+                                          replace)
+        
+    def get_usage_statistics(self, path: str = '') -> Dict[str, Dict[str, int]]:
+        """Per-type totals for the project, or for one file or directory (with its subtree).
+
+        Read from counters maintained while the analysis is built, so no graph
+        query runs; ``path`` is matched as the analyzed file paths are spelled.
+        """
+        with self.profiler.phase('get_usage_statistics'):
+            if not path:
+                return self.statistics.get()
+            path = scope_path(path)
+            if ('file', path) in self.statistics.counts:
+                return self.statistics.get('file', path)
+            return self.statistics.get('directory', path)
+
+    def get_usage_breakdown(self, kind: str = 'directory',
+                            path: str = '') -> Dict[str, Dict[str, Dict[str, int]]]:
+        """get_usage_statistics() for every directory or file (``kind``), keyed by path,
+        only for the file or directory ``path`` and what lies under it if given"""
+        if kind not in UsageStatistics.SCOPE_KINDS:
+            raise ValueError(f"unknown breakdown {kind!r}, expected one of "
+                             f"{', '.join(UsageStatistics.SCOPE_KINDS)}")
+        with self.profiler.phase('get_usage_breakdown'):
+            return self.statistics.breakdown(kind, path)
+        
+    def run_analysis(self, directory_path: str, incremental: bool = False,
+                     shards: Optional[List[str]] = None, allow_partial: bool = False):
+        """Run complete dead code analysis, or merge previously written shards"""
+        self.build_graph(directory_path, incremental, shards, allow_partial)
+        
+        dead_code = self.find_dead_code()
+        
+        stats = self.get_usage_statistics()
+        
+        return dead_code, stats
+        
+    def build_graph(self, directory_path: str, incremental: bool = False,
+                    shards: Optional[List[str]] = None, allow_partial: bool = False) -> None:
+        """The analysis and graph writes of run_analysis, leaving queries to the caller"""
+        logger.info("Starting dead code analysis...")
+        self.set_root(directory_path)
+        
+        if not incremental:
+            self.clear_database()
+        self.create_schema()
+        
+        if shards:
+            self.load_shards(shards, allow_partial)
+        else:
+            self.analyze_directory(directory_path)
+        
+        if incremental:
+            self.sync_graph()
+        else:
+            self.create_file_nodes()
+            self.create_graph_nodes()
+            self.create_usage_relationships()
+        self.create_statistics_nodes(replace=True)
+
+class Neo4jDeadCodeDetector(DeadCodeDetector):
+    """DeadCodeDetector writing to a Neo4j database"""
+    
+    def __init__(self, neo4j_uri: str, neo4j_user: str, neo4j_password: str,
+                 batch_size: int = DEFAULT_BATCH_SIZE, jobs: int = 1,
+                 cache: Optional[AnalysisCache] = None, project: str = DEFAULT_PROJECT,
+                 profiler: Optional[Profiler] = None, limits: Optional[ResourceLimits] = None,
+                 exclude: Iterable[str] = ()):
+        backend = Neo4jBackend(neo4j_uri, neo4j_user, neo4j_password,
+                               batch_size=batch_size, project=project)
+        super().__init__(backend, jobs=jobs, cache=cache, batch_size=batch_size,
+                         profiler=profiler, limits=limits, exclude=exclude)
+        
+    @property
+    def driver(self):
+        return self.backend.driver
+        
+    async def stream_directory_async(self, directory_path: str,
+                                     writers: int = DEFAULT_ASYNC_WRITERS) -> None:
+        """Analyze a directory while concurrent async writers store its nodes.
+
+        A producer thread parses files and feeds node batches into a bounded
+        queue drained by ``writers`` tasks on the async driver; a full queue
+        blocks the producer, so at most ``writers * 2`` batches wait to be
+        written. The queue does not bound the process's memory: each analysis
+        is merged into code_elements as in build_graph, because usages are
+        resolved only once every definition is known.
+        """
+        logger.info(f"Streaming directory with {writers} async writers: {directory_path}")
+        backend = self.backend
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=writers * 2)
+        errors: List[BaseException] = []
+        driver = backend.async_driver()
+        
+        async def run_batch(tx, query: str, rows: List[dict]):
+            result = await tx.run(query, rows=rows, project=backend.project)
+            await result.consume()
+            
+        async def writer():
+            async with driver.session() as session:
+                while True:
+                    item = await queue.get()
+                    try:
+                        if item is None:
+                            return
+                        # After a failure keep draining so producers never block forever
+                        if not errors:
+                            await session.execute_write(run_batch, *item)
+                            self.profiler.count('cypher_statements')
+                            self.profiler.count('rows_written', len(item[1]))
+                    except Exception as e:
+                        errors.append(e)
+                    finally:
+                        queue.task_done()
+                        
+        def produce_nodes():
+            # Runs in a worker thread; blocks whenever the queue is full
+            def put(item):
+                asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+                
+            pending: List[dict] = []
+            for analysis in self.iter_analyses(directory_path):
+                self.merge_analysis(analysis)
+                file_elements = {element.key: element
+                                 for element in analysis.definitions + analysis.imports}
+                pending.extend(map(backend.node_row, file_elements.values()))
+                if len(pending) >= self.batch_size:
+                    put((backend.NODES_QUERY, pending))
+                    pending = []
+            if pending:
+                put((backend.NODES_QUERY, pending))
+                
+        async def enqueue(query: str, rows: Iterable[dict]):
+            for batch in batched(rows, self.batch_size):
+                await queue.put((query, batch))
+                
+        tasks = [asyncio.create_task(writer()) for _ in range(writers)]
+        start = time.perf_counter()
+        try:
+            with self.profiler.phase('parse_and_write_nodes'):
+                await loop.run_in_executor(None, produce_nodes)
+                # Edges MATCH both endpoints, so every node must be committed first
+                await queue.join()
+            if errors:
+                raise errors[0]
+            
+            self.resolve_usages()
+            with self.profiler.phase('write_relationships'):
+                await enqueue(backend.IS_USED_QUERY,
+                              ({'id': key, 'is_used': True}
+                               for key, element in self.code_elements.items() if element.is_used))
+                await enqueue(backend.MODULES_QUERY,
+                              map(backend.module_row, self.module_rows(self.file_hashes)))
+                await enqueue(backend.FILES_QUERY,
+                              (backend.file_row(path, content_hash)
+                               for path, content_hash in self.file_hashes.items()))
+                await enqueue(backend.RELATIONSHIPS_QUERY,
+                              map(backend.relationship_row, self.usage_edges()))
+                await queue.join()
+        finally:
+            for _ in tasks:
+                await queue.put(None)
+            await asyncio.gather(*tasks)
+            await driver.close()
+            
+        if errors:
+            raise errors[0]
+        logger.info(f"Parsed and wrote {len(self.code_elements)} elements in "
+                    f"{time.perf_counter() - start:.2f}s")
+        
+    async def run_analysis_async(self, directory_path: str,
+                                 writers: int = DEFAULT_ASYNC_WRITERS):
+        """run_analysis with parsing and Neo4j writes overlapped"""
+        await self.build_graph_async(directory_path, writers)
         
         dead_code = self.find_dead_code()
         
         stats = self.get_usage_statistics()
         
         return dead_code, stats
+        
+    async def build_graph_async(self, directory_path: str,
+                                writers: int = DEFAULT_ASYNC_WRITERS) -> None:
+        logger.info("Starting dead code analysis...")
+        self.set_root(directory_path)
+        
+        self.clear_database()
+        self.create_schema()
+        await self.stream_directory_async(directory_path, writers)
+        self.create_statistics_nodes(replace=True)
+
+def element_record(element: CodeElement) -> dict:
+    return {
+        'name': element.name,
+        'type': element.type,
+        'file_path': element.file_path,
+        'line_number': element.line_number,
+    }
+
+class QueryService:
+    """Answers dead-code, usage and statistics queries against a resident analysis.
+
+    Results are cached per query until the analysis changes; ``lock``
+    serializes queries with refreshes and --watch updates.
+    """
+
+    def __init__(self, detector: DeadCodeDetector, directory_path: str,
+                 cache_size: int = DEFAULT_QUERY_CACHE_SIZE,
+                 root_kinds: Iterable[str] = DEFAULT_ROOT_KINDS, root_patterns: Iterable[str] = ()):
+        self.detector = detector
+        self.directory_path = directory_path
+        # Reachability roots, as given by --roots and --root
+        self.root_kinds = tuple(root_kinds)
+        self.root_patterns = tuple(root_patterns)
+        self.cache_size = cache_size
+        self.cache: OrderedDict = OrderedDict()
+        self.lock = threading.RLock()
+        self.scopes: Optional[ScopeIndex] = None
+
+    def invalidate(self) -> None:
+        with self.lock:
+            self.cache.clear()
+            self.scopes = None
+
+    def refresh(self) -> dict:
+        """Re-analyze the directory and sync the stored graph incrementally"""
+        with self.lock:
+            start = time.perf_counter()
+            self.detector.reset_analysis()
+            self.detector.run_analysis(self.directory_path, incremental=True)
+            self.invalidate()
+            return {'elements': len(self.detector.code_elements),
+                    'seconds': time.perf_counter() - start}
+
+    def _cached(self, key: tuple, compute):
+        with self.lock:
+            if key in self.cache:
+                self.cache.move_to_end(key)
+                return self.cache[key]
+            result = compute()
+            self.cache[key] = result
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+            return result
+
+    def dead_code(self, path: str = '', type: str = '', reachability: bool = False) -> dict:
+        def compute():
+            if reachability:
+                elements = [element for element in self.detector.find_unreachable_code(
+                                self.root_kinds, self.root_patterns)
+                            if in_scope(element.file_path, path)]
+            else:
+                elements = self.detector.find_dead_code(path)
+            items = [element_record(element) for element in elements
+                     if not type or element.type == type]
+            return {'count': len(items), 'items': items}
+        return self._cached(('dead_code', path, type, reachability), compute)
+
+    def usages(self, symbol: str) -> dict:
+        def compute():
+            detector = self.detector
+            if self.scopes is None:
+                self.scopes = ScopeIndex(detector.code_elements)
+            keys = [symbol] if symbol in detector.code_elements else detector.symbols.lookup(symbol)
+            matches = []
+            for key in keys:
+                element = detector.code_elements[key]
+                record = element_record(element)
+                record['is_used'] = element.is_used
+                record['usages'] = [
+                    {'file_path': FILE_TABLE.path(file_id), 'line_number': line_num,
+                     'user': self.scopes.enclosing(file_id, line_num)}
+                    for file_id, line_num in element.usage_locations()
+                ]
+                matches.append(record)
+            return {'symbol': symbol, 'matches': matches}
+        return self._cached(('usages', symbol), compute)
+
+    def statistics(self, path: str = '', breakdown: str = '') -> dict:
+        if breakdown:
+            return self._cached(('statistics', path, breakdown),
+                                lambda: self.detector.get_usage_breakdown(breakdown, path))
+        return self._cached(('statistics', path),
+                            lambda: self.detector.get_usage_statistics(path))
+
+    def unused_imports(self, path: str = '') -> dict:
+        def compute():
+            items = [element_record(element) for element in self.detector.unused_imports(path)]
+            return {'count': len(items), 'items': items}
+        return self._cached(('unused_imports', path), compute)
+
+    def most_used(self, limit: int = DEFAULT_MOST_USED) -> dict:
+        def compute():
+            items = []
+            for element, usage_count in self.detector.most_used(limit):
+                record = element_record(element)
+                record['usage_count'] = usage_count
+                items.append(record)
+            return {'count': len(items), 'items': items}
+        return self._cached(('most_used', limit), compute)
+
+    def handle(self, method: str, path: str, params: Dict[str, str]) -> Tuple[int, dict]:
+        """Route one request to (HTTP status, JSON body)"""
+        routes = {
+            '/dead-code': ('GET', lambda: self.dead_code(
+                params.get('path', ''), params.get('type', ''),
+                params.get('reachability', '') in ('1', 'true'))),
+            '/usages': ('GET', lambda: self.usages(params['symbol'])),
+            '/stats': ('GET', lambda: self.statistics(params.get('path', ''),
+                                                      params.get('breakdown', ''))),
+            '/unused-imports': ('GET', lambda: self.unused_imports(params.get('path', ''))),
+            '/most-used': ('GET', lambda: self.most_used(
+                int(params.get('limit', DEFAULT_MOST_USED)))),
+            '/refresh': ('POST', self.refresh),
+        }
+        if path not in routes:
+            return 404, {'error': f"unknown endpoint {path}",
+                         'endpoints': sorted(routes)}
+        expected, action = routes[path]
+        if method != expected:
+            return 405, {'error': f"{path} expects {expected}"}
+        try:
+            return 200, action()
+        except KeyError as e:
+            return 400, {'error': f"missing parameter {e}"}
+        except UnsupportedOperationError as e:
+            return 501, {'error': str(e)}
+        except ValueError as e:
+            return 400, {'error': f"invalid parameter: {e}"}
+
+class QueryRequestHandler(BaseHTTPRequestHandler):
+    """JSON over HTTP front end for the server's QueryService"""
+
+    def _respond(self, method: str):
+        url = urlsplit(self.path)
+        params = {name: values[-1] for name, values in parse_qs(url.query).items()}
+        try:
+            status, body = self.server.service.handle(method, url.path, params)
+        except Exception as e:
+            logger.error(f"Query {self.path} failed: {e}")
+            status, body = 500, {'error': str(e)}
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self._respond('GET')
+
+    def do_POST(self):
+        self._respond('POST')
+
+    def log_message(self, format, *args):
+        logger.info(f"{self.address_string()} {format % args}")
+
+class UnixQueryServer(ThreadingMixIn, UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        return request, ('unix', 0)
+
+    def server_close(self):
+        super().server_close()
+        try:
+            # Leave the path alone if something else has replaced the socket
+            if stat.S_ISSOCK(os.lstat(self.server_address).st_mode):
+                os.remove(self.server_address)
+        except FileNotFoundError:
+            pass
+
+def remove_stale_socket(socket_path: str) -> None:
+    """Remove a Unix socket left at socket_path, refusing to touch any other kind of file"""
+    try:
+        mode = os.lstat(socket_path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise FileExistsError(f"{socket_path} exists and is not a socket")
+    os.remove(socket_path)
+
+def make_query_server(service: QueryService, address: str):
+    """An HTTP server for ``host:port``/``port``, or ``unix:PATH`` for a Unix socket"""
+    if address.startswith('unix:'):
+        socket_path = address[len('unix:'):]
+        remove_stale_socket(socket_path)
+        server = UnixQueryServer(socket_path, QueryRequestHandler)
+    else:
+        host, _, port = address.rpartition(':')
+        server = ThreadingHTTPServer((host or DEFAULT_SERVE_HOST, int(port)), QueryRequestHandler)
+    server.service = service
+    return server
+
+def qualified_name(element: CodeElement, root: str) -> str:
+    """Dotted module path of the element's file relative to root, plus its name"""
+    module = os.path.splitext(os.path.relpath(element.file_path, root))[0]
+    parts = [part for part in module.split(os.sep) if part not in ('', '.')]
+    if parts and parts[-1] == '__init__':
+        parts.pop()
+    return '.'.join(parts + [element.name])
+
+class ResultWriter(ABC):
+    """Streams dead-code records to a file as they are produced.
+
+    ``begin`` receives the usage statistics, ``write`` one element and its
+    usage count at a time, and ``end`` the number of records written.
+    """
+
+    def __init__(self, stream, root: str, heading: str):
+        self.stream = stream
+        self.root = root
+        self.heading = heading
+
+    def record(self, element: CodeElement, usage_count: int) -> dict:
+        record = element_record(element)
+        record['qualified_name'] = qualified_name(element, self.root)
+        record['usage_count'] = usage_count
+        return record
+
+    def begin(self, stats: Dict[str, Dict[str, int]]) -> None:
+        pass
+
+    @abstractmethod
+    def write(self, element: CodeElement, usage_count: int) -> None:
+        raise NotImplementedError
+
+    def end(self, count: int) -> None:
+        pass
+
+class TextResultWriter(ResultWriter):
+    def begin(self, stats: Dict[str, Dict[str, int]]) -> None:
+        self.stream.write("Dead Code Detection Results\n")
+        self.stream.write("=" * 30 + "\n\n")
+        self.stream.write("Statistics:\n")
+        for code_type, data in stats.items():
+            self.stream.write(f"{code_type}: {data['unused']}/{data['total']} unused\n")
+        self.stream.write(f"\n{self.heading.title()}:\n")
+
+    def write(self, element: CodeElement, usage_count: int) -> None:
+        self.stream.write(f"{element.type.upper()}: {element.name} "
+                          f"({element.file_path}:{element.line_number})\n")
+
+class JsonlResultWriter(ResultWriter):
+    def write(self, element: CodeElement, usage_count: int) -> None:
+        self.stream.write(json.dumps(self.record(element, usage_count)) + "\n")
+
+class CsvResultWriter(ResultWriter):
+    FIELDS = ['file_path', 'line_number', 'type', 'name', 'qualified_name', 'usage_count']
+
+    def begin(self, stats: Dict[str, Dict[str, int]]) -> None:
+        self.writer = csv.DictWriter(self.stream, fieldnames=self.FIELDS)
+        self.writer.writeheader()
+
+    def write(self, element: CodeElement, usage_count: int) -> None:
+        self.writer.writerow(self.record(element, usage_count))
+
+class SarifResultWriter(ResultWriter):
+    """SARIF 2.1.0 log with one result per element, written without buffering results"""
+
+    RULE_ID = 'dead-code'
+
+    def begin(self, stats: Dict[str, Dict[str, int]]) -> None:
+        self.stats = stats
+        self.first = True
+        tool = {'driver': {'name': 'deadcode', 'rules': [{
+            'id': self.RULE_ID,
+            'shortDescription': {'text': self.heading.title()},
+        }]}}
+        self.stream.write('{"$schema": "https://json.schemastore.org/sarif-2.1.0.json", '
+                          '"version": "2.1.0", "runs": [{"tool": ' + json.dumps(tool) +
+                          ', "results": [\n')
+
+    def write(self, element: CodeElement, usage_count: int) -> None:
+        record = self.record(element, usage_count)
+        result = {
+            'ruleId': self.RULE_ID,
+            'level': 'warning',
+            'message': {'text': f"{self.heading.capitalize()}: {element.type} "
+                                f"'{record['qualified_name']}'"},
+            'locations': [{'physicalLocation': {
+                'artifactLocation': {
+                    'uri': os.path.relpath(element.file_path, self.root).replace(os.sep, '/'),
+                    'uriBaseId': 'SRCROOT',
+                },
+                'region': {'startLine': element.line_number},
+            }}],
+            'properties': {'type': element.type, 'qualifiedName': record['qualified_name'],
+                           'usageCount': usage_count},
+        }
+        self.stream.write(('' if self.first else ',\n') + json.dumps(result))
+        self.first = False
+
+    def end(self, count: int) -> None:
+        self.stream.write('\n], "properties": {"statistics": ' + json.dumps(self.stats) + '}}]}\n')
+
+RESULT_WRITERS = {
+    'text': TextResultWriter,
+    'jsonl': JsonlResultWriter,
+    'csv': CsvResultWriter,
+    'sarif': SarifResultWriter,
+}
+
+def project_name(directory_path: str) -> str:
+    """Default project id for a directory: its base name"""
+    return os.path.basename(os.path.abspath(directory_path)) or DEFAULT_PROJECT
+
+def write_skip_report(detector: DeadCodeDetector, path: str) -> None:
+    with open(path, 'w') as f:
+        json.dump({'skipped': detector.skip_report()}, f, indent=2)
+    print(f"Skip report saved to: {path}")
+
+def write_profile(detector: DeadCodeDetector, path: str) -> None:
+    with open(path, 'w') as f:
+        json.dump(detector.profile_report(), f, indent=2)
+    print(f"Profile saved to: {path}")
+
+def report_since(detector: DeadCodeDetector, args, root_kinds: List[str]) -> None:
+    """Print the dead code a change introduced and removed relative to --since"""
+    newly_dead, newly_live = detector.dead_code_since(
+        args.directory, args.since, root_kinds if args.reachability else None, args.root)
+    newly_dead = [element for element in newly_dead if in_scope(element.file_path, args.scope)]
+    newly_live = [element for element in newly_live if in_scope(element.file_path, args.scope)]
+        
+    output_lines = [f"NEWLY DEAD CODE since {args.since} ({len(newly_dead)} items):"]
+    output_lines += [f"+ {element.type.upper()}: {element.name} "
+                     f"({element.file_path}:{element.line_number})" for element in newly_dead]
+    output_lines.append(f"\nNEWLY LIVE CODE since {args.since} ({len(newly_live)} items):")
+    output_lines += [f"- {element.type.upper()}: {element.name} "
+                     f"({element.file_path}:{element.line_number})" for element in newly_live]
+    print("\n" + "\n".join(output_lines))
+    
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write("\n".join(output_lines) + "\n")
+        print(f"\nResults saved to: {args.output}")
+
+def watch_results(detector: DeadCodeDetector, args, root_kinds: List[str],
+                  service: Optional[QueryService] = None) -> None:
+    """Print dead code that appears or disappears as files change, until interrupted"""
+    print("Watching for changes (Ctrl-C to stop)...")
+    lock = service.lock if service is not None else None
+    if args.reachability:
+        dead_code = [element for element in detector.find_unreachable_code(root_kinds, args.root)
+                     if in_scope(element.file_path, args.scope)]
+    else:
+        dead_code = detector.find_dead_code(args.scope)
+    previous = {element.key: element for element in dead_code}
+    try:
+        for update in detector.watch(args.directory, args.poll_interval, lock):
+            with lock or nullcontext():
+                if service is not None:
+                    service.invalidate()
+                if args.reachability:
+                    dead_code = [element for element
+                                 in detector.find_unreachable_code(root_kinds, args.root)
+                                 if in_scope(element.file_path, args.scope)]
+                else:
+                    dead_code = detector.find_dead_code(args.scope)
+            current = {element.key: element for element in dead_code}
+            
+            print(f"\n{len(update.changed)} changed, {len(update.removed)} removed files; "
+                  f"{len(current)} potentially dead items")
+            for key in sorted(current.keys() - previous.keys()):
+                element = current[key]
+                print(f"+ {element.type.upper()}: {element.name} "
+                      f"({element.file_path}:{element.line_number})")
+            for key in sorted(previous.keys() - current.keys()):
+                element = previous[key]
+                print(f"- {element.type.upper()}: {element.name} "
+                      f"({element.file_path}:{element.line_number})")
+            previous = current
+    except KeyboardInterrupt:
+        print("\nStopped watching")
 
 def main():
     parser = argparse.ArgumentParser(description='Dead Code Detection using Neo4j')
     parser.add_argument('directory', help='Directory path to analyze')
+    parser.add_argument('--backend', choices=['neo4j', 'memory', 'csv'], default='neo4j',
+                       help='Where the code graph is stored: a Neo4j database, an '
+                            'in-process graph that needs no service, or CSV files for '
+                            'neo4j-admin database import (default: neo4j)')
+    parser.add_argument('--export-dir', default=DEFAULT_EXPORT_DIR,
+                       help=f'Directory the csv backend writes to (default: {DEFAULT_EXPORT_DIR})')
+    parser.add_argument('--compress', action='store_true',
+                       help='gzip the csv backend data files')
     parser.add_argument('--neo4j-uri', default='bolt://localhost:7687', 
                        help='Neo4j URI (default: bolt://localhost:7687)')
     parser.add_argument('--neo4j-user', default='neo4j', 
@@ -281,6 +3255,92 @@ def main():
     parser.add_argument('--neo4j-password', default='password', 
                        help='Neo4j password (default: password)')
     parser.add_argument('--output', help='Output file for results')
+    parser.add_argument('--format', choices=sorted(RESULT_WRITERS), default='text',
+                       help='Format of the --output file; records are streamed as they are '
+                            'read (default: text)')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                       help=f'Rows per Neo4j write transaction (default: {DEFAULT_BATCH_SIZE})')
+    parser.add_argument('--jobs', type=int, default=1,
+                       help='Worker processes used to parse files (default: 1, 0 = all cores)')
+    parser.add_argument('--project',
+                       help='Project id that scopes the stored graph, so several '
+                            'projects can share one database (default: directory name)')
+    parser.add_argument('--incremental', action='store_true',
+                       help='Update only the parts of the stored graph whose files changed '
+                            'instead of rebuilding it')
+    parser.add_argument('--async-writers', type=int, default=0, metavar='N',
+                       help='Overlap parsing with N concurrent async Neo4j writer tasks '
+                            f'(suggested: {DEFAULT_ASYNC_WRITERS}; default: off)')
+    parser.add_argument('--most-used', type=int, default=0, metavar='N',
+                       help='Also list the N most used functions, classes and variables with '
+                            'their usage counts')
+    parser.add_argument('--scope', default='', metavar='PATH',
+                       help='Only report dead code and statistics for this file or directory, '
+                            'spelled like the analyzed paths (e.g. sample_code/services)')
+    parser.add_argument('--unused-imports', action='store_true',
+                       help='Also list unused imports (within --scope)')
+    parser.add_argument('--reachability', action='store_true',
+                       help='Report definitions not transitively reachable from the roots '
+                            'instead of those with no reference at all')
+    parser.add_argument('--roots', default=','.join(DEFAULT_ROOT_KINDS),
+                       help=f'Comma-separated root kinds for --reachability, any of '
+                            f'{", ".join(ROOT_KINDS)} (default: %(default)s)')
+    parser.add_argument('--root', action='append', default=[], metavar='PATTERN',
+                       help='Extra reachability root: glob over qualified names, '
+                            'e.g. "Plugin.*" (repeatable)')
+    parser.add_argument('--no-cache', action='store_true',
+                       help='Do not read or write the per-file analysis cache')
+    parser.add_argument('--cache-dir', default=DEFAULT_CACHE_DIR,
+                       help=f'Analysis cache directory (default: {DEFAULT_CACHE_DIR})')
+    parser.add_argument('--cache-size-mb', type=int, default=DEFAULT_CACHE_SIZE_MB,
+                       help=f'Analysis cache size cap in MB (default: {DEFAULT_CACHE_SIZE_MB})')
+    parser.add_argument('--exclude', action='append', default=[], metavar='PATTERN',
+                       help='Skip files and directories whose path relative to the directory, '
+                            'or whose name, matches this glob, e.g. "*_pb2.py" or "build/*" '
+                            '(repeatable)')
+    parser.add_argument('--max-file-size-mb', type=float, default=DEFAULT_MAX_FILE_SIZE_MB,
+                       help=f'Skip larger files without reading them (default: '
+                            f'{DEFAULT_MAX_FILE_SIZE_MB}, 0 = no limit)')
+    parser.add_argument('--parse-timeout', type=float, default=0, metavar='SECONDS',
+                       help='Skip files whose analysis takes longer; parsing then runs in '
+                            'worker processes (default: no limit)')
+    parser.add_argument('--worker-memory-mb', type=int, default=0, metavar='MB',
+                       help='Cap the memory a parser worker process may use for one file, where '
+                            'the platform enforces RLIMIT_AS; parsing then runs in worker '
+                            'processes (default: no limit)')
+    parser.add_argument('--skip-report', metavar='PATH',
+                       help='Write the files skipped by a guard or a parse error, with the '
+                            'reason and time spent, to this JSON file')
+    parser.add_argument('--watch', action='store_true',
+                       help='After the initial analysis keep watching the directory and update '
+                            'the results and the graph whenever files change')
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                       help=f'Seconds between scans when --watch cannot use inotify '
+                            f'(default: {DEFAULT_POLL_INTERVAL})')
+    parser.add_argument('--shard', metavar='I/N',
+                       help='Only analyze shard I of N (1-based) of the top-level entries of the '
+                            'directory and save the partial results to --shard-output')
+    parser.add_argument('--shard-output', metavar='PATH',
+                       help='Where --shard writes its partial results')
+    parser.add_argument('--merge', nargs='+', metavar='SHARD',
+                       help='Build the graph and report from shard files instead of walking '
+                            'the directory')
+    parser.add_argument('--allow-partial', action='store_true',
+                       help='Let --merge go ahead when shards are missing; code only they '
+                            'use is then reported as dead')
+    parser.add_argument('--since', metavar='REV',
+                       help='Only report dead code introduced or removed since a git revision; '
+                            'files unchanged since REV come from the analysis cache')
+    parser.add_argument('--serve', metavar='ADDRESS',
+                       help='After the analysis answer JSON queries (/dead-code, /usages, /stats, '
+                            '/unused-imports, /most-used, POST /refresh) over HTTP on '
+                            '[HOST:]PORT or on unix:PATH')
+    parser.add_argument('--profile', metavar='PATH',
+                       help='Write per-phase timings, Cypher statement and row counts, peak RSS '
+                            'and the slowest files to this JSON file')
+    parser.add_argument('--profile-top', type=int, default=DEFAULT_PROFILE_TOP_FILES, metavar='N',
+                       help=f'Slowest files listed in the --profile report '
+                            f'(default: {DEFAULT_PROFILE_TOP_FILES})')
     
     args = parser.parse_args()
     
@@ -288,10 +3348,104 @@ def main():
         logger.error(f"Directory not found: {args.directory}")
         sys.exit(1)
         
-    detector = Neo4jDeadCodeDetector(args.neo4j_uri, args.neo4j_user, args.neo4j_password)
+    if args.async_writers and (args.backend != 'neo4j' or args.incremental):
+        parser.error("--async-writers requires the neo4j backend and a full (non-incremental) run")
+    if args.backend == 'csv' and args.incremental:
+        parser.error("the csv backend writes each row once and cannot be used with "
+                     "--incremental")
+    if args.backend == 'csv' and (args.watch or args.serve):
+        parser.error("--watch and --serve need a backend that can be updated (neo4j or memory)")
+    if args.backend == 'csv' and (args.most_used or args.unused_imports):
+        parser.error("--most-used and --unused-imports need a backend that can be queried "
+                     "(neo4j or memory)")
+        
+    shard = None
+    if args.shard:
+        try:
+            index, count = (int(part) for part in args.shard.split('/'))
+        except ValueError:
+            parser.error("--shard expects I/N, e.g. 2/8")
+        if not 1 <= index <= count:
+            parser.error("--shard index must be between 1 and N")
+        if not args.shard_output:
+            parser.error("--shard requires --shard-output")
+        shard = (index - 1, count)
+    if args.merge and (args.async_writers or args.shard):
+        parser.error("--merge cannot be combined with --async-writers or --shard")
+    if args.allow_partial and not args.merge:
+        parser.error("--allow-partial only applies to --merge")
+    if args.since and (args.merge or args.shard or args.watch or args.serve or args.incremental
+                       or args.async_writers):
+        parser.error("--since only reports changes and cannot be combined with graph, "
+                     "shard, watch or server options")
+        
+    root_kinds = [kind.strip() for kind in args.roots.split(',') if kind.strip()]
+    unknown_kinds = set(root_kinds) - set(ROOT_KINDS)
+    if unknown_kinds:
+        parser.error(f"unknown root kinds: {', '.join(sorted(unknown_kinds))}")
+        
+    cache = None
+    if not args.no_cache:
+        cache = AnalysisCache(args.cache_dir, args.cache_size_mb * 1024 * 1024)
+        
+    limits = ResourceLimits(max_file_size=int(args.max_file_size_mb * 1024 * 1024),
+                            parse_timeout=args.parse_timeout,
+                            memory_limit=args.worker_memory_mb * 1024 * 1024)
+        
+    jobs = args.jobs or os.cpu_count() or 1
+    if args.backend == 'memory' or shard is not None or args.since:
+        # Shards only parse and --since compares in memory; neither writes a graph
+        detector = DeadCodeDetector(InMemoryBackend(), jobs=jobs, cache=cache,
+                                    batch_size=args.batch_size, limits=limits,
+                                    exclude=args.exclude)
+    elif args.backend == 'csv':
+        backend = CsvExportBackend(args.export_dir, compress=args.compress,
+                                   project=args.project or project_name(args.directory))
+        detector = DeadCodeDetector(backend, jobs=jobs, cache=cache, batch_size=args.batch_size,
+                                    limits=limits, exclude=args.exclude)
+    else:
+        detector = Neo4jDeadCodeDetector(args.neo4j_uri, args.neo4j_user, args.neo4j_password,
+                                         batch_size=args.batch_size,
+                                         jobs=jobs,
+                                         cache=cache,
+                                         project=args.project or project_name(args.directory),
+                                         limits=limits,
+                                         exclude=args.exclude)
+    if args.profile:
+        detector.enable_profiling(args.profile_top)
+    if args.watch:
+        detector.keep_usages()
     
     try:
-        dead_code, stats = detector.run_analysis(args.directory)
+        if shard is not None:
+            detector.write_shard(args.directory, args.shard_output, shard)
+            if args.profile:
+                write_profile(detector, args.profile)
+            if args.skip_report:
+                write_skip_report(detector, args.skip_report)
+            return
+        if args.since:
+            report_since(detector, args, root_kinds)
+            if args.profile:
+                write_profile(detector, args.profile)
+            if args.skip_report:
+                write_skip_report(detector, args.skip_report)
+            return
+            
+        if args.async_writers:
+            asyncio.run(detector.build_graph_async(args.directory, writers=args.async_writers))
+        else:
+            detector.build_graph(args.directory, incremental=args.incremental,
+                                 shards=args.merge,
+                                 allow_partial=args.allow_partial)
+        stats = detector.get_usage_statistics(args.scope)
+        heading = "POTENTIALLY DEAD CODE"
+        dead_code = detector.iter_dead_code(args.scope)
+        if args.reachability:
+            dead_code = ((element, usage_count) for element, usage_count
+                         in detector.iter_unreachable_code(root_kinds, args.root)
+                         if in_scope(element.file_path, args.scope))
+            heading = "UNREACHABLE CODE"
         
         print("\n" + "="*60)
         print("DEAD CODE DETECTION RESULTS")
@@ -302,31 +3456,81 @@ def main():
             print(f"{code_type.upper()}:")
             print(f"  Total: {data['total']}")
             print(f"  Used: {data['used']}")
-            print(f"  Unused: {data['unused']} ({data['unused']/data['total']*100:.1f}%)")
+            percent = data['unused'] / data['total'] * 100 if data['total'] else 0.0
+            print(f"  Unused: {data['unused']} ({percent:.1f}%)")
+        if detector.skipped:
+            reasons = Counter(skipped.reason for skipped in detector.skipped.values())
+            print(f"SKIPPED FILES: {len(detector.skipped)} "
+                  f"({', '.join(f'{reason}: {n}' for reason, n in sorted(reasons.items()))})")
             
-        print(f"\nPOTENTIALLY DEAD CODE ({len(dead_code)} items):")
+        print(f"\n{heading}:")
         print("-" * 40)
         
-        output_lines = []
-        for element in dead_code:
-            line = f"{element.type.upper()}: {element.name} ({element.file_path}:{element.line_number})"
-            print(line)
-            output_lines.append(line)
+        with ExitStack() as stack:
+            writer = None
+            if args.output:
+                stream = stack.enter_context(open(args.output, 'w', newline='', encoding='utf-8'))
+                writer = RESULT_WRITERS[args.format](stream, args.directory, heading)
+                writer.begin(stats)
+                
+            count = 0
+            for element, usage_count in dead_code:
+                print(f"{element.type.upper()}: {element.name} "
+                      f"({element.file_path}:{element.line_number})")
+                if writer is not None:
+                    writer.write(element, usage_count)
+                count += 1
+            print(f"({count} items)")
             
+            if writer is not None:
+                writer.end(count)
+                
+        if args.unused_imports:
+            unused_imports = detector.unused_imports(args.scope)
+            print(f"\nUNUSED IMPORTS ({len(unused_imports)} items):")
+            print("-" * 40)
+            for element in unused_imports:
+                print(f"IMPORT: {element.name} ({element.file_path}:{element.line_number})")
+        if args.most_used:
+            print("\nMOST USED:")
+            print("-" * 40)
+            for element, usage_count in detector.most_used(args.most_used):
+                print(f"{element.type.upper()}: {element.name} "
+                      f"({element.file_path}:{element.line_number}) - {usage_count} usages")
         if args.output:
-            with open(args.output, 'w') as f:
-                f.write("Dead Code Detection Results\n")
-                f.write("=" * 30 + "\n\n")
-                f.write("Statistics:\n")
-                for code_type, data in stats.items():
-                    f.write(f"{code_type}: {data['unused']}/{data['total']} unused\n")
-                f.write("\nPotentially Dead Code:\n")
-                for line in output_lines:
-                    f.write(line + "\n")
             print(f"\nResults saved to: {args.output}")
             
+        if args.profile:
+            write_profile(detector, args.profile)
+        if args.skip_report:
+            write_skip_report(detector, args.skip_report)
+            
         print("\n" + "="*60)
         
+        service = None
+        server = None
+        if args.serve:
+            service = QueryService(detector, args.directory, root_kinds=root_kinds,
+                                   root_patterns=args.root)
+            server = make_query_server(service, args.serve)
+            print(f"Serving queries on {args.serve} (Ctrl-C to stop)")
+            if not args.watch:
+                try:
+                    server.serve_forever()
+                except KeyboardInterrupt:
+                    print("\nStopped serving")
+                finally:
+                    server.server_close()
+            else:
+                threading.Thread(target=server.serve_forever, daemon=True).start()
+        if args.watch:
+            try:
+                watch_results(detector, args, root_kinds, service)
+            finally:
+                if server is not None:
+                    server.shutdown()
+                    server.server_close()
+        
     except Exception as e:
         logger.error(f"Analysis failed: {e}")
         sys.exit(1)
@@ -0,0 +1,319 @@
+"""
+Regression tests for incremental updates and shard merges: the graph kept
+current by update_files + sync_update (--watch), by
+build_graph(incremental=True) and merged from --shard files must match a
+fresh build of the same tree. Reachability is checked root kind by root kind,
+and --since against a temporary git repository.
+
+    python3 -m pytest -q tests
+"""
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import deadcode
+
+PROJECT = {
+    'pkg/__init__.py': '',
+    'pkg/models.py': (
+        "class Product:\n"
+        "    def price(self):\n"
+        "        return 1\n"
+        "\n"
+        "def unused_helper():\n"
+        "    return Product()\n"
+    ),
+    'pkg/services.py': (
+        "from pkg.models import Product\n"
+        "\n"
+        "def make():\n"
+        "    return Product()\n"
+        "\n"
+        "def helper():\n"
+        "    pass\n"
+    ),
+    'main.py': (
+        "from pkg.services import make\n"
+        "\n"
+        "def main():\n"
+        "    make()\n"
+        "\n"
+        "if __name__ == '__main__':\n"
+        "    main()\n"
+    ),
+}
+
+# Each step writes (content) or removes (None) files, as an editor would
+STEPS = [
+    {'pkg/services.py': "def make():\n    return None\n\ndef helper():\n    pass\n"},
+    {'pkg/extra.py': "from pkg.services import helper\n\ndef run():\n    helper()\n"},
+    {'pkg/extra.py': None},
+    {'pkg/models.py': "class Product:\n    def cost(self):\n        return 2\n"},
+    {'main.py': "from pkg.models import Product\n\ndef main():\n    Product().cost()\n"},
+    {'pkg/sub/__init__.py': '', 'pkg/sub/deep.py': "def make():\n    return make\n"},
+    {'pkg/sub/deep.py': None, 'pkg/sub/__init__.py': None},
+    {'pkg/services.py': None, 'pkg/models.py': PROJECT['pkg/models.py']},
+]
+
+
+def write_tree(files):
+    changed = []
+    for path, content in files.items():
+        path = os.path.join('proj', path)
+        changed.append(path)
+        if content is None:
+            os.remove(path)
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(content)
+    return changed
+
+
+def fresh_build():
+    detector = deadcode.DeadCodeDetector(deadcode.InMemoryBackend())
+    detector.build_graph('proj')
+    return detector
+
+
+def graph_state(backend):
+    return {
+        'nodes': {key: (node.name, node.type, node.file_path, node.line_number, node.is_used)
+                  for key, node in backend.nodes.items()},
+        'edges': dict(backend.edges),
+        'files': dict(backend.files),
+        'modules': dict(backend.modules),
+        'summaries': dict(backend.summaries),
+    }
+
+
+@pytest.fixture
+def project(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_tree(PROJECT)
+
+
+def test_watch_updates_match_fresh_build(project):
+    detector = deadcode.DeadCodeDetector(deadcode.InMemoryBackend())
+    detector.keep_usages()
+    detector.build_graph('proj')
+    assert graph_state(detector.backend) == graph_state(fresh_build().backend)
+
+    for step, files in enumerate(STEPS):
+        update = detector.update_files(write_tree(files))
+        detector.sync_update(update)
+        expected = fresh_build()
+        assert graph_state(detector.backend) == graph_state(expected.backend), f"step {step}"
+        assert detector.find_dead_code() == expected.find_dead_code(), f"step {step}"
+        assert detector.get_usage_statistics('proj/pkg') == \
+            expected.get_usage_statistics('proj/pkg'), f"step {step}"
+
+
+def test_uses_count_every_reference(project):
+    detector = deadcode.DeadCodeDetector(deadcode.InMemoryBackend())
+    detector.keep_usages()
+    detector.build_graph('proj')
+    detector.sync_update(detector.update_files(write_tree({
+        'pkg/extra.py': "from pkg.services import helper\n\n"
+                        "def run():\n    helper(); helper(); helper()\n    helper()\n    helper()\n"})))
+    for backend in (detector.backend, fresh_build().backend):
+        assert backend.edges['proj/pkg/extra.py::run', 'proj/pkg/services.py::helper'] == \
+            (4, 4, 4, 5, 6)
+        assert dict((element.name, count) for element, count in backend.iter_most_used())['helper'] == 5
+
+
+def test_incremental_build_matches_fresh_build(project):
+    backend = deadcode.InMemoryBackend()
+    deadcode.DeadCodeDetector(backend).build_graph('proj')
+
+    for step, files in enumerate(STEPS):
+        write_tree(files)
+        deadcode.DeadCodeDetector(backend).build_graph('proj', incremental=True)
+        assert graph_state(backend) == graph_state(fresh_build().backend), f"step {step}"
+
+
+def test_unchanged_files_are_not_rewritten(project):
+    detector = deadcode.DeadCodeDetector(deadcode.InMemoryBackend())
+    detector.keep_usages()
+    detector.build_graph('proj')
+
+    update = detector.update_files([os.path.join('proj', 'main.py')])
+    assert not update.changed and not update.removed
+
+
+def write_shards(count):
+    paths = []
+    for index in range(count):
+        path = f"shard{index + 1}of{count}.bin"
+        deadcode.DeadCodeDetector(deadcode.InMemoryBackend()).write_shard('proj', path,
+                                                                          (index, count))
+        paths.append(path)
+    return paths
+
+
+def test_shard_merge_matches_full_run(project):
+    write_tree({'lib/__init__.py': '', 'lib/core.py': "def core():\n    pass\n",
+                'app.py': "from lib.core import core\nfrom pkg.services import helper\n\n"
+                          "def start():\n    core()\n    helper()\n"})
+    expected = fresh_build()
+    for count in (1, 2, 3):
+        detector = deadcode.DeadCodeDetector(deadcode.InMemoryBackend())
+        detector.build_graph('proj', shards=write_shards(count))
+        assert graph_state(detector.backend) == graph_state(expected.backend), f"{count} shards"
+        assert detector.find_dead_code() == expected.find_dead_code(), f"{count} shards"
+
+
+def test_shard_merge_rejects_incomplete_sets(project):
+    paths = write_shards(3)
+    detector = deadcode.DeadCodeDetector(deadcode.InMemoryBackend())
+    with pytest.raises(ValueError, match='missing shards 2 of 3'):
+        detector.load_shards([paths[0], paths[2]])
+    with pytest.raises(ValueError, match='given twice'):
+        detector.load_shards(paths + [paths[0]])
+    with pytest.raises(ValueError, match='different counts'):
+        detector.load_shards(paths[:2] + write_shards(2)[:1])
+    deadcode.DeadCodeDetector(deadcode.InMemoryBackend()).write_shard('proj/pkg', 'other.bin',
+                                                                      (1, 3))
+    with pytest.raises(ValueError, match='different directories'):
+        detector.load_shards([paths[0], 'other.bin', paths[2]])
+    detector.load_shards([paths[0], paths[2]], allow_partial=True)
+
+
+def test_directory_statistics_stop_at_the_analyzed_directory(project):
+    root = os.path.abspath('proj')
+    detector = deadcode.DeadCodeDetector(deadcode.InMemoryBackend())
+    detector.build_graph(root)
+    directories = {scope for kind, scope, _ in detector.backend.summaries if kind == 'directory'}
+    assert directories == {root, os.path.join(root, 'pkg')}
+    assert detector.get_usage_statistics(os.path.dirname(root)) == {}
+    assert detector.get_usage_statistics(root) == detector.get_usage_statistics()
+
+
+def test_stats_endpoint_breaks_down_by_directory_or_file(project):
+    detector = fresh_build()
+    service = deadcode.QueryService(detector, 'proj')
+    status, body = service.handle('GET', '/stats', {'breakdown': 'directory'})
+    assert status == 200 and sorted(body) == ['proj', 'proj/pkg']
+    assert body['proj/pkg'] == detector.get_usage_statistics('proj/pkg')
+    status, body = service.handle('GET', '/stats', {'path': 'proj/pkg', 'breakdown': 'file'})
+    assert sorted(body) == ['proj/pkg/models.py', 'proj/pkg/services.py']
+    assert body['proj/pkg/models.py'] == detector.get_usage_statistics('proj/pkg/models.py')
+    assert service.handle('GET', '/stats', {'breakdown': 'module'})[0] == 400
+
+
+def test_dead_code_endpoint_is_scoped_by_file_or_directory(project):
+    write_tree({'pkg_old/__init__.py': '', 'pkg_old/legacy.py': "def legacy():\n    pass\n"})
+    service = deadcode.QueryService(fresh_build(), 'proj')
+    names = lambda status_body: {item['name'] for item in status_body[1]['items']}
+    assert names(service.handle('GET', '/dead-code', {'path': 'proj/pkg'})) == \
+        {'unused_helper', 'helper', 'Product.price'}
+    assert names(service.handle('GET', '/dead-code', {'path': 'proj/pkg/models'})) == set()
+    assert names(service.handle('GET', '/dead-code', {'path': 'proj/pkg_old/legacy.py'})) == \
+        {'legacy'}
+
+
+REACHABILITY = {
+    'reach/__init__.py': '',
+    'reach/entry.py': (
+        "def start():\n"
+        "    chain_a()\n"
+        "\n"
+        "def chain_a():\n"
+        "    chain_b()\n"
+        "\n"
+        "def chain_b():\n"
+        "    pass\n"
+        "\n"
+        "def dead_a():\n"
+        "    dead_b()\n"
+        "\n"
+        "def dead_b():\n"
+        "    pass\n"
+        "\n"
+        "if __name__ == '__main__':\n"
+        "    start()\n"
+    ),
+    'reach/api.py': (
+        "__all__ = ['public']\n"
+        "\n"
+        "def public():\n"
+        "    support()\n"
+        "\n"
+        "def support():\n"
+        "    pass\n"
+        "\n"
+        "def orphan():\n"
+        "    pass\n"
+    ),
+    'reach/test_things.py': "def test_something():\n    tested()\n\ndef tested():\n    pass\n",
+    'reach/registry.py': "def configured():\n    pass\n\nREGISTRY = [configured]\n",
+}
+
+
+def unreachable(detector, root_kinds=deadcode.DEFAULT_ROOT_KINDS, root_patterns=()):
+    return {element.name for element in detector.find_unreachable_code(root_kinds, root_patterns)
+            if deadcode.in_scope(element.file_path, 'proj/reach')}
+
+
+def test_reachability_follows_chains_from_each_root_kind(project):
+    write_tree(REACHABILITY)
+    detector = fresh_build()
+
+    # dead_b is used, but only by dead code; configured is only used at module level
+    assert unreachable(detector) == {'dead_a', 'dead_b', 'orphan', 'configured'}
+    # Usage-based detection misses the chain but reports unused roots
+    assert {element.name for element in detector.find_dead_code('proj/reach')} == \
+        {'dead_a', 'orphan', 'public', 'test_something'}
+    assert unreachable(detector, deadcode.DEFAULT_ROOT_KINDS + ('module',)) == \
+        {'dead_a', 'dead_b', 'orphan'}
+    assert unreachable(detector, root_patterns=['dead_*']) == {'orphan', 'configured'}
+    assert unreachable(detector, ('main', '__all__', 'tests')) == \
+        {'start', 'chain_a', 'chain_b', 'dead_a', 'dead_b', 'orphan', 'configured'}
+    assert unreachable(detector, ('main', '__main__', 'tests')) >= {'public', 'support'}
+    assert unreachable(detector, ('main', '__main__', '__all__')) >= {'test_something', 'tested'}
+
+
+def test_dead_code_endpoint_uses_the_configured_roots(project):
+    write_tree(REACHABILITY)
+    detector = fresh_build()
+    params = {'path': 'proj/reach', 'reachability': '1'}
+    for root_kinds, root_patterns in ((deadcode.DEFAULT_ROOT_KINDS, ()),
+                                      (('main', 'module'), ('dead_*',))):
+        service = deadcode.QueryService(detector, 'proj', root_kinds=root_kinds,
+                                        root_patterns=root_patterns)
+        items = service.handle('GET', '/dead-code', params)[1]['items']
+        assert {item['name'] for item in items} == \
+            unreachable(detector, root_kinds, root_patterns)
+
+
+def git(*args):
+    subprocess.run(['git', '-c', 'user.name=test', '-c', 'user.email=test@example.com', *args],
+                   check=True, capture_output=True)
+
+
+def test_dead_code_since_reports_changes_against_a_revision(project):
+    git('init', '-q')
+    git('add', 'proj')
+    git('commit', '-q', '-m', 'base')
+    write_tree({'main.py': "from pkg.services import make\n\ndef main():\n    pass\n",
+                'pkg/extra.py': "from pkg.services import helper\n\ndef run():\n    helper()\n"})
+    names = lambda elements: {element.name for element in elements}
+
+    detector = deadcode.DeadCodeDetector(deadcode.InMemoryBackend())
+    newly_dead, newly_live = detector.dead_code_since('proj', 'HEAD')
+    assert (names(newly_dead), names(newly_live)) == ({'make', 'run'}, {'helper'})
+
+    detector = deadcode.DeadCodeDetector(deadcode.InMemoryBackend())
+    newly_dead, newly_live = detector.dead_code_since('proj', 'HEAD', deadcode.DEFAULT_ROOT_KINDS)
+    # Product is still used, but only by make and unused_helper; helper only by run
+    assert (names(newly_dead), names(newly_live)) == ({'make', 'run', 'Product'}, set())
+
+    git('add', 'proj')
+    git('commit', '-q', '-m', 'change')
+    detector = deadcode.DeadCodeDetector(deadcode.InMemoryBackend())
+    assert detector.dead_code_since('proj', 'HEAD') == ([], [])